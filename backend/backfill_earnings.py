@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Rebuild the owner_daily_earnings rollup from completed bookings
+Safe to re-run: the table is cleared and recomputed in one transaction
+"""
+import os
+import sys
+
+# Add the current directory to Python path so 'src' module can be found
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.main import app
+from src.utils.earnings import rebuild_owner_earnings
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            rows = rebuild_owner_earnings()
+            print(f"✅ Rebuilt owner earnings rollup ({rows} rows)")
+        except Exception as e:
+            print(f"❌ Failed: {e}")
+            sys.exit(1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Build the full US gazetteer used for offline geocoding
+Downloads the Census Bureau Gazetteer files (every incorporated place and
+census-designated place, plus every ZIP code tabulation area) and writes
+city,state,zip,latitude,longitude rows to data/us_places.csv, or to the
+path given as the first argument. The bundled file only covers large
+cities; run this at build time for small towns and ZIP-only locations.
+"""
+import csv
+import io
+import os
+import re
+import sys
+import urllib.request
+import zipfile
+
+GAZETTEER_YEAR = os.environ.get('GAZETTEER_YEAR', '2023')
+BASE_URL = f"https://www2.census.gov/geo/docs/maps-data/data/gazetteer/{GAZETTEER_YEAR}_Gazetteer"
+PLACES_URL = f"{BASE_URL}/{GAZETTEER_YEAR}_Gaz_place_national.zip"
+ZCTA_URL = f"{BASE_URL}/{GAZETTEER_YEAR}_Gaz_zcta_national.zip"
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'us_places.csv')
+
+# "Boulder city", "Highlands Ranch CDP", "Nashville-Davidson metropolitan government (balance)"
+PLACE_SUFFIX = re.compile(r'(\s+([a-z][a-z-]*|CDP))+(\s+\(balance\))?$')
+
+
+def download_rows(url):
+    """Rows of the tab-separated file inside a Census Gazetteer zip"""
+    with urllib.request.urlopen(url, timeout=60) as response:
+        archive = zipfile.ZipFile(io.BytesIO(response.read()))
+    with archive.open(archive.namelist()[0]) as f:
+        reader = csv.DictReader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='\t')
+        for row in reader:
+            # The last header carries trailing whitespace
+            yield {key.strip(): value.strip() for key, value in row.items() if key}
+
+
+def place_name(name):
+    return PLACE_SUFFIX.sub('', name).strip()
+
+
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT
+    try:
+        places = [(place_name(row['NAME']), row['USPS'], '', row['INTPTLAT'], row['INTPTLONG'])
+                  for row in download_rows(PLACES_URL)]
+        zips = [('', '', row['GEOID'], row['INTPTLAT'], row['INTPTLONG']) for row in download_rows(ZCTA_URL)]
+    except Exception as e:
+        print(f"❌ Could not download the Census gazetteer: {e}")
+        sys.exit(1)
+
+    # Write next to the target and swap, so a running app never reads half a file
+    temporary = f"{output}.tmp"
+    with open(temporary, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['city', 'state', 'zip', 'latitude', 'longitude'])
+        writer.writerows(places)
+        writer.writerows(zips)
+    os.replace(temporary, output)
+    print(f"✅ Wrote {len(places)} places and {len(zips)} ZIP codes to {output}")
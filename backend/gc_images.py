@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Delete uploaded images that no listing or profile references any more
+Usage: python gc_images.py [--dry-run] [--grace-hours N]
+Files younger than the grace period (default 24h) are always kept.
+"""
+import os
+import sys
+
+# Add the current directory to Python path so 'src' module can be found
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.main import app
+from src.utils.image_gc import collect_garbage, GRACE_SECONDS
+
+if __name__ == '__main__':
+    dry_run = '--dry-run' in sys.argv
+    grace_seconds = GRACE_SECONDS
+    if '--grace-hours' in sys.argv:
+        grace_seconds = float(sys.argv[sys.argv.index('--grace-hours') + 1]) * 3600
+
+    with app.app_context():
+        try:
+            removed = collect_garbage(grace_seconds=grace_seconds, dry_run=dry_run)
+            action = 'Would remove' if dry_run else 'Removed'
+            print(f"✅ {action} {removed['originals']} images and {removed['variant_folders']} variant folders "
+                  f"({removed['bytes'] / (1024 * 1024):.1f} MB)")
+        except Exception as e:
+            print(f"❌ Failed: {e}")
+            sys.exit(1)
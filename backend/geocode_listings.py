@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Retry geocoding every listing without coordinates
+Run after installing a bigger gazetteer (build_gazetteer.py) or enabling
+GEOCODER=nominatim; startup only geocodes listings never attempted, offline.
+"""
+import os
+import sys
+
+# Add the current directory to Python path so 'src' module can be found
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.main import app
+from src.utils.geo import backfill_equipment_coordinates
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            located = backfill_equipment_coordinates(retry=True, online=True)
+            print(f"✅ Geocoded {located} listings")
+        except Exception as e:
+            print(f"❌ Failed: {e}")
+            sys.exit(1)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Generate image variants outside the web process
+Processes every pending upload plus every original in the uploads folder
+that is missing variants (all of them with --force). With --watch it keeps
+polling for new uploads, for use with IMAGE_WORKER=cli on the web service.
+--publish also copies every processed upload to the storage backend (run
+once after switching STORAGE_BACKEND to s3).
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the current directory to Python path so 'src' module can be found
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.utils.images import (
+    UPLOAD_FOLDER, SAVE_FORMATS, IMAGE_WORKERS, backfill_targets, pending_uploads, process_image, publish_upload
+)
+
+WATCH_POLL_SECONDS = 2
+
+
+def process_all(pool, targets):
+    results = {'ready': 0, 'failed': 0}
+    for filename, status in zip(targets, pool.map(process_image, targets)):
+        results[status] += 1
+        if status == 'failed':
+            print(f"⚠️  Could not decode {filename}")
+    return len(targets), results
+
+
+if __name__ == '__main__':
+    watch = '--watch' in sys.argv
+    force = '--force' in sys.argv
+    try:
+        with ProcessPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+            total, results = process_all(pool, backfill_targets(force=force))
+            print(f"✅ Processed {total} images ({results['ready']} ready, {results['failed']} failed)")
+            if '--publish' in sys.argv:
+                originals = [name for name in os.listdir(UPLOAD_FOLDER) if os.path.splitext(name)[1].lstrip('.').lower() in SAVE_FORMATS]
+                list(pool.map(publish_upload, originals))
+                print(f"✅ Published {len(originals)} images to storage")
+            while watch:
+                time.sleep(WATCH_POLL_SECONDS)
+                total, results = process_all(pool, pending_uploads())
+                if total:
+                    print(f"✅ Processed {total} images ({results['ready']} ready, {results['failed']} failed)")
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Queue hourly/daily message digest emails that are due
+The outbox worker already does this every minute; this script is for
+running it from cron when EMAIL_WORKER=cli. Safe to run at any time: users
+whose digest isn't due yet are skipped.
+"""
+import os
+import sys
+
+# Add the current directory to Python path so 'src' module can be found
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ['EMAIL_WORKER'] = 'cli'
+
+from src.main import app
+from src.utils.digests import run_due_digests
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            sent = run_due_digests()
+            print(f"✅ Queued {sent} message digests")
+        except Exception as e:
+            print(f"❌ Failed: {e}")
+            sys.exit(1)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Deliver queued emails from the email_outbox table
+Run as its own process and set EMAIL_WORKER=cli on the web service so the
+web workers don't start their own sender threads. Use --once to send a
+single batch and exit (e.g. from cron).
+"""
+import os
+import sys
+
+# Add the current directory to Python path so 'src' module can be found
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ['EMAIL_WORKER'] = 'cli'
+
+from src.main import app
+from src.utils.email_outbox import process_outbox, run_worker
+
+if __name__ == '__main__':
+    if '--once' in sys.argv:
+        with app.app_context():
+            sent = process_outbox()
+        print(f"✅ Processed {sent} queued emails")
+    else:
+        print("📬 Email outbox worker running (Ctrl+C to stop)")
+        try:
+            run_worker(app)
+        except KeyboardInterrupt:
+            pass
@@ -3,7 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
@@ -15,9 +15,11 @@ from src.models.user import db
 from src.models.equipment import Equipment
 from src.models.booking import Booking
 from src.models.payment import Payment
-from src.models.message import Message
+from src.models.message import Message, Conversation
 from src.models.identity_verification import IdentityVerification
 from src.models.review import Review
+from src.models.earnings import OwnerDailyEarnings
+from src.models.outbox import OutboundEmail
 
 from src.routes.auth import auth_bp
 from src.routes.equipment import equipment_bp
@@ -38,6 +40,9 @@ from src.routes.admin import admin_bp
 from src.routes.admin_moderation import admin_mod_bp
 from src.routes.subscription import subscription_bp
 from src.routes.boost import boost_bp
+from src.routes.events import events_bp
+from src.utils.events import event_broker
+from src.utils.file_serving import FILE_OFFLOAD, X_ACCEL_ASSETS_PREFIX, serve_file, asset_hash, is_fingerprinted
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
@@ -57,12 +62,26 @@ CORS(app, resources={
         ],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["X-Next-Cursor"],
         "supports_credentials": True
     }
 })
 
 # Initialize extensions
 jwt = JWTManager(app)
+
+
+@jwt.token_verification_loader
+def verify_token_scope(jwt_header, jwt_data):
+    # Stream tokens travel in URLs; they may open the event stream and nothing else
+    from src.routes.events import is_stream_only_token
+    return not is_stream_only_token(jwt_data) or request.endpoint == 'events.event_stream'
+
+
+@jwt.token_verification_failed_loader
+def token_scope_failed(jwt_header, jwt_data):
+    return jsonify({'error': 'Token is not valid for this endpoint'}), 401
+
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
@@ -84,7 +103,14 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# gunicorn runs 16 threads per worker (see Procfile); give each one a connection without queueing
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', '16')),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '4')),
+    'pool_pre_ping': True
+} if database_url else {}
 db.init_app(app)
+event_broker.init_app(app)
 
 # Create database tables
 with app.app_context():
@@ -140,21 +166,31 @@ app.register_blueprint(admin_bp, url_prefix='/api')
 app.register_blueprint(admin_mod_bp, url_prefix='/api')
 app.register_blueprint(subscription_bp, url_prefix='/api/subscription')
 app.register_blueprint(boost_bp, url_prefix='/api/boost')
+app.register_blueprint(events_bp, url_prefix='/api')
 
 # Serve static assets (CSS, JS, images)
+ASSETS_FOLDER = os.path.join(app.static_folder, 'assets')
+app.config['USE_X_SENDFILE'] = FILE_OFFLOAD == 'x-sendfile'
+
+
+@app.template_global()
+def asset_url(path):
+    """Fingerprinted URL for an asset, cacheable forever because it changes with the content"""
+    version = asset_hash(ASSETS_FOLDER, path)
+    return f"/assets/{path}?v={version}" if version else f"/assets/{path}"
+
+
 @app.route('/assets/<path:path>')
 def serve_assets(path):
-    response = send_from_directory(os.path.join(app.static_folder, 'assets'), path)
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    # Hashed names/URLs are cached for a year; anything else is revalidated with its ETag
+    immutable = is_fingerprinted(path, request.args.get('v'), ASSETS_FOLDER)
+    return serve_file(ASSETS_FOLDER, path, X_ACCEL_ASSETS_PREFIX, immutable=immutable)
 
 # Serve uploaded images
 @app.route('/uploads/<path:filename>')
 def serve_uploads(filename):
-    uploads_folder = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
-    return send_from_directory(uploads_folder, filename)
+    from src.routes.upload import send_upload
+    return send_upload(filename)
 
 # Health check endpoint
 @app.route('/health')
@@ -171,6 +207,8 @@ def health():
 
 
 if __name__ == '__main__':
+    from src.utils.email_outbox import start_email_worker
+    start_email_worker(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
 
 # Force rebuild Thu Oct 23 16:42:10 EDT 2025
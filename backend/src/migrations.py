@@ -154,3 +154,120 @@ def run_migrations(app):
             # Don't crash the app if migrations fail
             pass
 
+        # Migration 5: Full-text search index for equipment (PostgreSQL and SQLite)
+        logger.info("Running migration: Equipment full-text search index")
+        try:
+            from src.utils.search import ensure_search_index
+            ensure_search_index(db.engine)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create search index, falling back to ILIKE search: {e}")
+
+        # Migration 6: Backfill the owner earnings rollup, and rebuild it whenever its totals drift
+        logger.info("Running migration: Backfill owner_daily_earnings")
+        try:
+            from src.utils.earnings import rebuild_owner_earnings, rollup_out_of_sync
+            if rollup_out_of_sync():
+                rows = rebuild_owner_earnings()
+                logger.info(f"✅ Rebuilt {rows} owner earnings rows")
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️  Could not backfill owner earnings: {e}")
+
+        # Migration 7: Index-backed booking overlap checks
+        logger.info("Running migration: Booking overlap index and exclusion constraint")
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_booking_equipment_status_dates ON booking (equipment_id, status, start_date, end_date)"))
+                conn.commit()
+                logger.info("✅ Created booking overlap index")
+                
+                if db.engine.dialect.name == 'postgresql':
+                    exists = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'booking_no_overlap'")).first()
+                    if not exists:
+                        # Makes double bookings impossible even when two requests pass the overlap check at once
+                        conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+                        try:
+                            conn.execute(text("""
+                                ALTER TABLE booking ADD CONSTRAINT booking_no_overlap
+                                EXCLUDE USING gist (equipment_id WITH =, daterange(start_date, end_date, '[]') WITH &&)
+                                WHERE (status IN ('pending', 'confirmed', 'active'))
+                            """))
+                            conn.commit()
+                            logger.info("✅ Added booking_no_overlap exclusion constraint")
+                        except Exception:
+                            conn.rollback()
+                            # Name the double bookings an admin has to resolve before the constraint can be added
+                            conflicts = conn.execute(text("""
+                                SELECT a.equipment_id, a.id, b.id FROM booking a
+                                JOIN booking b ON b.equipment_id = a.equipment_id AND b.id > a.id
+                                    AND b.start_date <= a.end_date AND a.start_date <= b.end_date
+                                WHERE a.status IN ('pending', 'confirmed', 'active')
+                                    AND b.status IN ('pending', 'confirmed', 'active')
+                                ORDER BY a.equipment_id, a.id, b.id
+                                LIMIT 100
+                            """)).all()
+                            for equipment_id, first_id, second_id in conflicts:
+                                logger.warning(f"⚠️  Overlapping bookings {first_id} and {second_id} for equipment {equipment_id}")
+                            raise
+        except Exception as e:
+            logger.warning(f"⚠️  Could not add booking overlap constraint (existing overlapping bookings?): {e}")
+
+        # Migration 8: Backfill conversation summaries the first time the table exists
+        logger.info("Running migration: Backfill conversations")
+        try:
+            from src.models.message import Message, Conversation
+            from src.utils.conversations import rebuild_conversations
+            if Conversation.query.first() is None and Message.query.first() is not None:
+                rows = rebuild_conversations()
+                logger.info(f"✅ Backfilled {rows} conversations")
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️  Could not backfill conversations: {e}")
+
+        # Migration 9: Partial index behind the polled unread message count
+        logger.info("Running migration: Unread messages index")
+        try:
+            predicate = 'is_read = false' if db.engine.dialect.name == 'postgresql' else 'is_read = 0'
+            with db.engine.connect() as conn:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_messages_unread_receiver ON messages (receiver_id) WHERE {predicate}"))
+                conn.commit()
+                logger.info("✅ Created unread messages index")
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create unread messages index: {e}")
+
+        # Migration 10: Message notification preferences on user
+        logger.info("Running migration: Message notification preferences")
+        try:
+            from sqlalchemy import inspect
+            existing_columns = [column['name'] for column in inspect(db.engine).get_columns('user')]
+            with db.engine.connect() as conn:
+                if 'message_notification_mode' not in existing_columns:
+                    conn.execute(text("ALTER TABLE \"user\" ADD COLUMN message_notification_mode VARCHAR(20) DEFAULT 'instant'"))
+                if 'last_message_digest_at' not in existing_columns:
+                    conn.execute(text("ALTER TABLE \"user\" ADD COLUMN last_message_digest_at TIMESTAMP"))
+                conn.commit()
+                logger.info("✅ Message notification preference columns ready")
+        except Exception as e:
+            logger.warning(f"⚠️  Could not add message notification columns: {e}")
+
+        # Migration 11: Equipment coordinates for radius search
+        logger.info("Running migration: Equipment coordinates")
+        try:
+            from sqlalchemy import inspect
+            existing_columns = [column['name'] for column in inspect(db.engine).get_columns('equipment')]
+            with db.engine.connect() as conn:
+                if 'latitude' not in existing_columns:
+                    conn.execute(text("ALTER TABLE equipment ADD COLUMN latitude FLOAT"))
+                if 'longitude' not in existing_columns:
+                    conn.execute(text("ALTER TABLE equipment ADD COLUMN longitude FLOAT"))
+                if 'geocoded_at' not in existing_columns:
+                    conn.execute(text("ALTER TABLE equipment ADD COLUMN geocoded_at TIMESTAMP"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_equipment_lat_lon ON equipment (latitude, longitude)"))
+                conn.commit()
+            from src.utils.geo import backfill_equipment_coordinates
+            located = backfill_equipment_coordinates()
+            logger.info(f"✅ Equipment coordinates ready ({located} listings geocoded)")
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️  Could not add equipment coordinates: {e}")
+
@@ -1,7 +1,23 @@
 from src.models.user import db
 from datetime import datetime
 
+# Statuses that hold the equipment's calendar; overlap checks only consider these
+ACTIVE_BOOKING_STATUSES = ('pending', 'confirmed', 'active')
+# PostgreSQL exclusion constraint added by migration 7
+OVERLAP_CONSTRAINT = 'booking_no_overlap'
+
+
+def is_overlap_violation(error):
+    """True when an IntegrityError was raised by the booking overlap constraint"""
+    diag = getattr(error.orig, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == OVERLAP_CONSTRAINT
+
 class Booking(db.Model):
+    __table_args__ = (
+        # Covers the overlap check: equipment_id = ? AND status IN (...) AND start_date <= ? AND end_date >= ?
+        db.Index('idx_booking_equipment_status_dates', 'equipment_id', 'status', 'start_date', 'end_date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id'), nullable=False)
     renter_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -23,8 +39,12 @@ class Booking(db.Model):
     def __repr__(self):
         return f'<Booking {self.id}>'
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        """
+        Serialize the booking. fields optionally limits the output to a set of
+        keys; nested 'equipment'/'renter' objects are only loaded when included.
+        """
+        data = {
             'id': self.id,
             'equipment_id': self.equipment_id,
             'renter_id': self.renter_id,
@@ -37,8 +57,12 @@ class Booking(db.Model):
             'deposit_percentage': self.deposit_percentage,
             'remaining_amount': self.remaining_amount,
             'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'equipment': self.equipment.to_dict() if self.equipment else None,
-            'renter': self.renter.to_dict() if self.renter else None
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
-
+        if fields is None or 'equipment' in fields:
+            data['equipment'] = self.equipment.to_dict() if self.equipment else None
+        if fields is None or 'renter' in fields:
+            data['renter'] = self.renter.to_dict() if self.renter else None
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields}
+        return data
@@ -0,0 +1,32 @@
+from src.models.user import db
+from datetime import datetime
+
+class OwnerDailyEarnings(db.Model):
+    """Per owner/equipment/day totals of completed bookings, maintained by src/utils/earnings.py"""
+    __tablename__ = 'owner_daily_earnings'
+    __table_args__ = (
+        db.UniqueConstraint('owner_id', 'equipment_id', 'day', name='uq_owner_daily_earnings'),
+        db.Index('idx_owner_daily_earnings_owner_day', 'owner_id', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # Booking day (created_at), matches the dashboard's month buckets
+    gross = db.Column(db.Float, nullable=False, default=0.0)  # Sum of total_cost
+    net = db.Column(db.Float, nullable=False, default=0.0)  # Owner's share after platform commission
+    bookings = db.Column(db.Integer, nullable=False, default=0)  # Number of completed bookings
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<OwnerDailyEarnings owner={self.owner_id} equipment={self.equipment_id} {self.day}>'
+    
+    def to_dict(self):
+        return {
+            'owner_id': self.owner_id,
+            'equipment_id': self.equipment_id,
+            'day': self.day.isoformat() if self.day else None,
+            'gross': self.gross,
+            'net': self.net,
+            'bookings': self.bookings
+        }
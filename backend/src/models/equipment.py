@@ -1,8 +1,14 @@
 from src.models.user import db
 from datetime import datetime
 import json
+from src.utils.images import variant_urls
 
 class Equipment(db.Model):
+    __table_args__ = (
+        # Bounding box prefilter for radius searches (see src/utils/geo.py)
+        db.Index('idx_equipment_lat_lon', 'latitude', 'longitude'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(120), nullable=False)
@@ -15,6 +21,9 @@ class Equipment(db.Model):
     image_url = db.Column(db.String(255))  # Legacy single image
     image_urls = db.Column(db.Text)  # JSON array of multiple image URLs
     location = db.Column(db.String(255))  # City, State or full address
+    latitude = db.Column(db.Float)  # Geocoded from location or the owner's city/state (see utils/geo.py)
+    longitude = db.Column(db.Float)
+    geocoded_at = db.Column(db.DateTime)  # Last geocoding attempt, set even when nothing matched
     security_deposit = db.Column(db.Float, default=0.0)  # Owner-specified refundable deposit
     is_available = db.Column(db.Boolean, default=True)
     average_rating = db.Column(db.Float, default=0.0)  # Average rating from reviews
@@ -60,6 +69,8 @@ class Equipment(db.Model):
                     'member_since': self.owner.created_at.isoformat() if self.owner.created_at else None
                 }
         
+        image_urls = json.loads(self.image_urls) if self.image_urls else ([self.image_url] if self.image_url else [])
+        
         return {
             'id': self.id,
             'owner_id': self.owner_id,
@@ -71,8 +82,13 @@ class Equipment(db.Model):
             'monthly_price': self.monthly_price,
             'capacity_spec': self.capacity_spec,
             'image_url': self.image_url,
-            'image_urls': json.loads(self.image_urls) if self.image_urls else ([self.image_url] if self.image_url else []),
+            'image_urls': image_urls,
+            'images': [variant_urls(url) or {'original': url} for url in image_urls],
+            'thumbnail_url': (variant_urls(self.image_url) or {}).get('thumb', self.image_url),
+            'card_image_url': (variant_urls(self.image_url) or {}).get('card', self.image_url),
             'location': self.location,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'security_deposit': self.security_deposit,
             'is_available': self.is_available,
             'is_boosted': self.is_boosted,
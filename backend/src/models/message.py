@@ -3,6 +3,11 @@ from datetime import datetime
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Partial index for the polled unread count: receiver_id = ? AND is_read = false
+        db.Index('idx_messages_unread_receiver', 'receiver_id',
+                 postgresql_where=db.text('is_read = false'), sqlite_where=db.text('is_read = 0')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id'), nullable=False)
@@ -33,3 +38,51 @@ class Message(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+
+class Conversation(db.Model):
+    """
+    One row per (equipment, participant pair) summarizing the thread for the inbox.
+    The pair is stored ordered (user_low_id < user_high_id) so both directions share a row.
+    Maintained by src/utils/conversations.py.
+    """
+    __tablename__ = 'conversations'
+    __table_args__ = (
+        db.UniqueConstraint('equipment_id', 'user_low_id', 'user_high_id', name='uq_conversation_participants'),
+        db.Index('idx_conversations_low_last', 'user_low_id', 'last_message_at'),
+        db.Index('idx_conversations_high_last', 'user_high_id', 'last_message_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id', ondelete='CASCADE'), nullable=False)
+    user_low_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    user_high_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    last_message_id = db.Column(db.Integer)
+    last_message = db.Column(db.Text)
+    last_sender_id = db.Column(db.Integer)
+    last_message_at = db.Column(db.DateTime, default=datetime.utcnow)
+    unread_low = db.Column(db.Integer, nullable=False, default=0)  # Unread messages for user_low_id
+    unread_high = db.Column(db.Integer, nullable=False, default=0)  # Unread messages for user_high_id
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    equipment = db.relationship('Equipment')
+    user_low = db.relationship('User', foreign_keys=[user_low_id])
+    user_high = db.relationship('User', foreign_keys=[user_high_id])
+    
+    def __repr__(self):
+        return f'<Conversation {self.id} equipment {self.equipment_id} {self.user_low_id}/{self.user_high_id}>'
+    
+    def to_dict(self, user_id):
+        """Inbox entry as seen by user_id"""
+        is_low = user_id == self.user_low_id
+        partner = self.user_high if is_low else self.user_low
+        return {
+            'equipment_id': self.equipment_id,
+            'equipment_name': self.equipment.name if self.equipment else None,
+            'partner_id': partner.id if partner else (self.user_high_id if is_low else self.user_low_id),
+            'partner_name': f"{partner.first_name} {partner.last_name}" if partner else None,
+            'last_message': self.last_message,
+            'last_message_time': self.last_message_at.isoformat() if self.last_message_at else None,
+            'unread_count': self.unread_low if is_low else self.unread_high
+        }
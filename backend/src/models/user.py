@@ -45,11 +45,15 @@ class User(db.Model):
     subscription_end_date = db.Column(db.DateTime)
     trial_ends_at = db.Column(db.DateTime)  # For free trials
     
+    # Notification preferences
+    message_notification_mode = db.Column(db.String(20), default='instant')  # instant, hourly, daily
+    last_message_digest_at = db.Column(db.DateTime)  # Messages newer than this go in the next digest
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    equipment = db.relationship('Equipment', backref='owner', lazy=True, cascade='all, delete-orphan')
+    equipment = db.relationship('Equipment', backref='owner', lazy=True, cascade='all, delete-orphan', foreign_keys='Equipment.owner_id')
     bookings = db.relationship('Booking', backref='renter', lazy=True, foreign_keys='Booking.renter_id')
 
     def __repr__(self):
@@ -81,6 +85,7 @@ class User(db.Model):
             'subscription_start_date': self.subscription_start_date.isoformat() if self.subscription_start_date else None,
             'subscription_end_date': self.subscription_end_date.isoformat() if self.subscription_end_date else None,
             'trial_ends_at': self.trial_ends_at.isoformat() if self.trial_ends_at else None,
+            'message_notification_mode': self.message_notification_mode or 'instant',
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
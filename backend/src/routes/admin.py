@@ -3,6 +3,7 @@ import os
 from src.models.user import db, User
 from src.models.equipment import Equipment
 from src.models.booking import Booking
+from src.models.earnings import OwnerDailyEarnings
 from src.models.message import Message
 from src.models.review import Review
 from src.models.identity_verification import IdentityVerification
@@ -38,7 +39,8 @@ def reset_database():
         message_count = Message.query.delete()
         deleted_counts['messages'] = message_count
         
-        # 3. Delete bookings (depends on users and equipment)
+        # 3. Delete bookings (depends on users and equipment) and the earnings rolled up from them
+        OwnerDailyEarnings.query.delete()
         booking_count = Booking.query.delete()
         deleted_counts['bookings'] = booking_count
         
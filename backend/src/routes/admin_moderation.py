@@ -6,6 +6,10 @@ from src.models.equipment import Equipment
 from src.models.booking import Booking
 from src.models.message import Message
 from src.models.payment import Payment
+from src.utils.autocomplete import autocomplete_index
+from src.utils.response_cache import invalidate_equipment
+from src.utils.serializers import serialize_equipment_list, serialize_bookings, parse_fields
+from src.utils.pagination import keyset_page, cursor_for, cached_count, count_cache_key, InvalidCursor
 
 admin_mod_bp = Blueprint('admin_moderation', __name__)
 
@@ -24,6 +28,33 @@ def admin_required(fn):
     wrapper.__name__ = fn.__name__
     return wrapper
 
+def paginate_newest_first(query, model, count_key):
+    """
+    Cursor-paginate an admin listing newest first.
+    Returns (items, metadata); totals are cached estimates, not per-request counts.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    cursor = request.args.get('cursor')
+    order = [(model.created_at, 'desc'), (model.id, 'desc')]
+    
+    if cursor or page <= 1:
+        items, next_cursor = keyset_page(query, order, 'newest', cursor, per_page)
+    else:
+        # Legacy page numbers still work but pay for an OFFSET scan
+        rows = query.order_by(model.created_at.desc(), model.id.desc()).offset((page - 1) * per_page).limit(per_page + 1).all()
+        items = rows[:per_page]
+        next_cursor = cursor_for(items[-1], order, 'newest') if len(rows) > per_page else None
+    
+    total = cached_count(query, count_cache_key(count_key, request.args))
+    return items, {
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'current_page': page,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }
+
 # ==================== DASHBOARD STATS ====================
 
 @admin_mod_bp.route('/admin/dashboard/stats', methods=['GET'])
@@ -55,8 +86,8 @@ def get_dashboard_stats():
             },
             'recent_activity': {
                 'users': [u.to_dict() for u in recent_users],
-                'equipment': [e.to_dict() for e in recent_equipment],
-                'bookings': [b.to_dict() for b in recent_bookings]
+                'equipment': serialize_equipment_list(recent_equipment),
+                'bookings': serialize_bookings(recent_bookings)
             }
         }), 200
     except Exception as e:
@@ -69,8 +100,6 @@ def get_dashboard_stats():
 def get_all_users():
     """Get all users with optional filters"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         search = request.args.get('search', '')
         is_banned = request.args.get('is_banned', None)
         
@@ -88,17 +117,15 @@ def get_all_users():
             query = query.filter_by(is_banned=(is_banned == 'true'))
         
         # Paginate
-        pagination = query.order_by(User.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        users, page_info = paginate_newest_first(query, User, 'admin_users')
         
         return jsonify({
             'success': True,
-            'users': [u.to_dict() for u in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
+            'users': [u.to_dict() for u in users],
+            **page_info
         }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -120,8 +147,8 @@ def get_user_details():
         return jsonify({
             'success': True,
             'user': user.to_dict(),
-            'equipment': [e.to_dict() for e in equipment],
-            'bookings': [b.to_dict() for b in bookings]
+            'equipment': serialize_equipment_list(equipment),
+            'bookings': serialize_bookings(bookings)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -197,8 +224,12 @@ def delete_user():
         if user.is_admin:
             return jsonify({'error': 'Cannot delete admin users'}), 403
         
+        equipment_ids = [equipment.id for equipment in user.equipment]
         db.session.delete(user)
         db.session.commit()
+        for equipment_id in equipment_ids:
+            autocomplete_index.remove(equipment_id)
+            invalidate_equipment(equipment_id)
         
         return jsonify({
             'success': True,
@@ -215,8 +246,6 @@ def delete_user():
 def get_all_equipment():
     """Get all equipment with optional filters"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         status = request.args.get('status', None)  # pending, approved, rejected
         search = request.args.get('search', '')
         
@@ -233,17 +262,15 @@ def get_all_equipment():
             )
         
         # Paginate
-        pagination = query.order_by(Equipment.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        equipment, page_info = paginate_newest_first(query, Equipment, 'admin_equipment')
         
         return jsonify({
             'success': True,
-            'equipment': [e.to_dict() for e in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
+            'equipment': serialize_equipment_list(equipment),
+            **page_info
         }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -265,6 +292,7 @@ def approve_equipment():
         equipment.rejection_reason = None
         
         db.session.commit()
+        invalidate_equipment(equipment_id)
         
         return jsonify({
             'success': True,
@@ -293,6 +321,7 @@ def reject_equipment():
         equipment.rejection_reason = data.get('reason', 'No reason provided')
         
         db.session.commit()
+        invalidate_equipment(equipment_id)
         
         return jsonify({
             'success': True,
@@ -315,6 +344,8 @@ def delete_equipment():
         
         db.session.delete(equipment)
         db.session.commit()
+        autocomplete_index.remove(equipment_id)
+        invalidate_equipment(equipment_id)
         
         return jsonify({
             'success': True,
@@ -329,22 +360,17 @@ def delete_equipment():
 @admin_mod_bp.route('/admin/bookings', methods=['GET'])
 @admin_required
 def get_all_bookings():
-    """Get all bookings"""
+    """Get all bookings (?fields=id,status,... to skip nested equipment/renter)"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        pagination = Booking.query.order_by(Booking.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        bookings, page_info = paginate_newest_first(Booking.query, Booking, 'admin_bookings')
         
         return jsonify({
             'success': True,
-            'bookings': [b.to_dict() for b in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
+            'bookings': serialize_bookings(bookings, parse_fields(request.args.get('fields'))),
+            **page_info
         }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
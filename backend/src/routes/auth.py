@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from datetime import datetime
 from src.models.user import db, User
+from src.utils.digests import MESSAGE_NOTIFICATION_MODES
+from src.utils.response_cache import invalidate
+from src.utils.geo import geocode_equipment
 
 auth_bp = Blueprint('auth', __name__)
 # Using werkzeug for password hashing
@@ -164,8 +168,24 @@ def update_profile():
         user.state = data['state']
     if 'zip_code' in data:
         user.zip_code = data['zip_code']
+    if 'city' in data or 'state' in data or 'zip_code' in data:
+        # Listings without their own location are placed at the owner's address
+        for equipment in user.equipment:
+            geocode_equipment(equipment, owner=user, online=False)
+    if 'message_notification_mode' in data:
+        mode = data['message_notification_mode']
+        if mode not in MESSAGE_NOTIFICATION_MODES:
+            return jsonify({'error': f"message_notification_mode must be one of: {', '.join(MESSAGE_NOTIFICATION_MODES)}"}), 400
+        if mode != 'instant' and (user.message_notification_mode or 'instant') == 'instant':
+            # Start the digest window now so earlier, already emailed messages aren't repeated
+            user.last_message_digest_at = datetime.utcnow()
+        user.message_notification_mode = mode
     
     db.session.commit()
+    # Listing pages show the owner's name, bio and location; filters count by city/state
+    invalidate(*[f"equipment:{equipment.id}" for equipment in user.equipment])
+    if user.equipment and ('city' in data or 'state' in data):
+        invalidate('equipment_filters')
     
     return jsonify({
         'message': 'Profile updated successfully',
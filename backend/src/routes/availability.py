@@ -1,30 +1,61 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from src.models.booking import Booking
+from src.models.booking import Booking, ACTIVE_BOOKING_STATUSES
+from src.utils.availability import get_blocked_ranges, clip_ranges
 
 availability_bp = Blueprint('availability', __name__)
 
+# Longest from/to window a single request may ask for
+MAX_WINDOW_DAYS = 731
+
 @availability_bp.route('/equipment/<int:equipment_id>/blocked-dates', methods=['GET'])
 def get_blocked_dates(equipment_id):
-    """Get all blocked dates for an equipment item"""
-    # Get all confirmed, active, or pending bookings
-    bookings = Booking.query.filter(
-        Booking.equipment_id == equipment_id,
-        Booking.status.in_(['pending', 'confirmed', 'active'])
-    ).all()
+    """
+    Get blocked dates for an equipment item
     
-    # Generate list of blocked dates
-    blocked_dates = []
-    for booking in bookings:
-        current_date = booking.start_date
-        while current_date <= booking.end_date:
-            blocked_dates.append(current_date.isoformat())
-            current_date += timedelta(days=1)
+    Query Parameters:
+    - format: dates (default, one ISO date per day) or ranges (merged [start, end] pairs)
+    - from / to: optional YYYY-MM-DD window to limit the response to (at most MAX_WINDOW_DAYS)
     
-    return jsonify({
-        'equipment_id': equipment_id,
-        'blocked_dates': blocked_dates
-    }), 200
+    Responses carry an ETag; a matching If-None-Match returns 304.
+    """
+    response_format = request.args.get('format', 'dates')
+    try:
+        window_start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        window_end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if window_start and window_end:
+        if window_end < window_start:
+            return jsonify({'error': 'to must not be before from'}), 400
+        if (window_end - window_start).days > MAX_WINDOW_DAYS:
+            return jsonify({'error': f'Date window is limited to {MAX_WINDOW_DAYS} days'}), 400
+    
+    ranges = clip_ranges(get_blocked_ranges(equipment_id), window_start, window_end)
+    
+    if response_format == 'ranges':
+        payload = {
+            'equipment_id': equipment_id,
+            'blocked_ranges': [[start.isoformat(), end.isoformat()] for start, end in ranges]
+        }
+    else:
+        # Generate list of blocked dates
+        blocked_dates = []
+        for start, end in ranges:
+            current_date = start
+            while current_date <= end:
+                blocked_dates.append(current_date.isoformat())
+                current_date += timedelta(days=1)
+        payload = {
+            'equipment_id': equipment_id,
+            'blocked_dates': blocked_dates
+        }
+    
+    response = jsonify(payload)
+    # Hash of the exact bytes sent, so the ETag changes whenever the body does
+    response.add_etag()
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
 
 
 @availability_bp.route('/equipment/<int:equipment_id>/check-availability', methods=['POST'])
@@ -44,7 +75,7 @@ def check_availability(equipment_id):
     # Check for conflicting bookings
     conflicting_bookings = Booking.query.filter(
         Booking.equipment_id == equipment_id,
-        Booking.status.in_(['pending', 'confirmed', 'active']),
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
         Booking.start_date <= end_date,
         Booking.end_date >= start_date
     ).first()
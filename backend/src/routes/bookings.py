@@ -1,14 +1,46 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from src.models.user import db, User
 from src.models.equipment import Equipment
-from src.models.booking import Booking
+from src.models.booking import Booking, ACTIVE_BOOKING_STATUSES, is_overlap_violation
 from src.routes.verification import can_rent_equipment, calculate_trust_level
+from src.utils.autocomplete import autocomplete_index
+from src.utils.pagination import keyset_page, InvalidCursor
+from src.utils.serializers import serialize_bookings, parse_fields
+from src.utils.earnings import complete_booking
+from src.utils.availability import invalidate_blocked_dates
+from src.utils.events import publish_booking_status
 from src.utils.email_notifications import send_booking_confirmation_email, send_new_booking_notification_email
 
 bookings_bp = Blueprint('bookings', __name__)
 
+def bookings_list_response(query):
+    """
+    Serialize a bookings query as a JSON list.
+    With ?limit= the list is paged newest first and the next page's cursor
+    is sent in the X-Next-Cursor header, keeping the response a plain list.
+    ?fields=id,status,... projects each booking down to the listed keys.
+    """
+    fields = parse_fields(request.args.get('fields'))
+    limit = request.args.get('limit', type=int)
+    if not limit:
+        return jsonify(serialize_bookings(query.all(), fields)), 200
+    
+    try:
+        bookings, next_cursor = keyset_page(
+            query, [(Booking.created_at, 'desc'), (Booking.id, 'desc')], 'newest',
+            request.args.get('cursor'), max(1, min(limit, 200))
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(serialize_bookings(bookings, fields))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
 @bookings_bp.route('/bookings', methods=['POST'])
 @jwt_required()
 def create_booking():
@@ -56,10 +88,10 @@ def create_booking():
     if start_date < datetime.now().date():
         return jsonify({'error': 'Start date cannot be in the past'}), 400
     
-    # Check for conflicting bookings
+    # Check for conflicting bookings (uses idx_booking_equipment_status_dates)
     conflicting_bookings = Booking.query.filter(
         Booking.equipment_id == data['equipment_id'],
-        Booking.status.in_(['pending', 'confirmed', 'active']),
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
         Booking.start_date <= end_date,
         Booking.end_date >= start_date
     ).first()
@@ -87,9 +119,16 @@ def create_booking():
     )
     
     db.session.add(new_booking)
-    db.session.commit()
-    
-    # Send email notifications
+    try:
+        db.session.flush()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_overlap_violation(e):
+            raise
+        # booking_no_overlap (PostgreSQL) caught a concurrent booking for the same dates
+        return jsonify({'error': 'Equipment is already booked for these dates'}), 409
+    
+    # Queue email notifications in the booking's transaction
     try:
         owner = User.query.get(equipment.owner_id)
         send_booking_confirmation_email(new_booking, equipment, renter, owner)
@@ -97,6 +136,10 @@ def create_booking():
     except Exception as e:
         print(f"Error sending booking emails: {e}")
     
+    db.session.commit()
+    autocomplete_index.record_booking(new_booking.equipment_id)
+    invalidate_blocked_dates(new_booking.equipment_id)
+    
     return jsonify({
         'message': 'Booking created successfully',
         'booking': new_booking.to_dict()
@@ -123,9 +166,8 @@ def get_booking(booking_id):
 def get_my_bookings():
     """Get all bookings for the current user (as renter)"""
     user_id = int(get_jwt_identity())
-    bookings = Booking.query.filter_by(renter_id=user_id).all()
     
-    return jsonify([booking.to_dict() for booking in bookings]), 200
+    return bookings_list_response(Booking.query.filter_by(renter_id=user_id))
 
 @bookings_bp.route('/equipment/<int:equipment_id>/bookings', methods=['GET'])
 @jwt_required()
@@ -141,9 +183,7 @@ def get_equipment_bookings(equipment_id):
     if equipment.owner_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    bookings = Booking.query.filter_by(equipment_id=equipment_id).all()
-    
-    return jsonify([booking.to_dict() for booking in bookings]), 200
+    return bookings_list_response(Booking.query.filter_by(equipment_id=equipment_id))
 
 @bookings_bp.route('/bookings/<int:booking_id>/status', methods=['PUT'])
 @jwt_required()
@@ -176,7 +216,8 @@ def update_booking_status(booking_id):
     elif new_status == 'active' and is_owner and booking.status == 'confirmed':
         booking.status = 'active'
     elif new_status == 'completed' and is_owner and booking.status == 'active':
-        booking.status = 'completed'
+        if not complete_booking(booking):
+            return jsonify({'error': 'Booking is already completed'}), 409
         
         # Update renter's trust level
         renter = User.query.get(booking.renter_id)
@@ -195,6 +236,8 @@ def update_booking_status(booking_id):
         return jsonify({'error': 'Invalid status transition'}), 400
     
     db.session.commit()
+    invalidate_blocked_dates(booking.equipment_id)
+    publish_booking_status(booking, booking.equipment.owner_id)
     
     return jsonify({
         'message': 'Booking status updated successfully',
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import User, db
 from src.models.equipment import Equipment
+from src.utils.autocomplete import autocomplete_index
+from src.utils.response_cache import cached_response, invalidate_equipment
 from datetime import datetime, timedelta
 import stripe
 import os
@@ -37,6 +39,7 @@ BOOST_PRICING = {
 }
 
 @boost_bp.route('/pricing', methods=['GET'])
+@cached_response('boost_pricing', ttl=3600)
 def get_boost_pricing():
     """Get boost pricing options"""
     return jsonify({
@@ -155,6 +158,8 @@ def boost_success():
             
             equipment.total_boosts_purchased += 1
             db.session.commit()
+            autocomplete_index.upsert(equipment)
+            invalidate_equipment(equipment.id)
             
             return jsonify({
                 'message': 'Boost activated successfully',
@@ -234,6 +239,8 @@ def boost_webhook():
                 
                 equipment.total_boosts_purchased += 1
                 db.session.commit()
+                autocomplete_index.upsert(equipment)
+                invalidate_equipment(equipment.id)
     
     return jsonify({'status': 'success'}), 200
 
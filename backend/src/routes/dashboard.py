@@ -4,11 +4,19 @@ from src.models.user import db, User
 from src.models.equipment import Equipment
 from src.models.booking import Booking
 from src.models.payment import Payment
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta
+from src.models.earnings import OwnerDailyEarnings
+from src.utils.serializers import serialize_bookings
+from sqlalchemy import func
+from datetime import datetime
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+def month_bucket(column):
+    """SQL expression formatting a timestamp column as 'YYYY-MM' on the current database"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(func.date_trunc('month', column), 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
 @dashboard_bp.route('/dashboard/owner-stats', methods=['GET'])
 @jwt_required()
 def get_owner_stats():
@@ -34,23 +42,49 @@ def get_owner_stats():
             'earnings_by_month': []
         }), 200
     
-    # Get all bookings for owner's equipment
-    all_bookings = Booking.query.filter(Booking.equipment_id.in_(equipment_ids)).all()
+    # Booking counts and pipeline revenue per (equipment, status) in a single GROUP BY
+    booking_stats = db.session.query(
+        Booking.equipment_id,
+        Booking.status,
+        func.count(Booking.id),
+        func.coalesce(func.sum(Booking.total_cost), 0)
+    ).filter(
+        Booking.equipment_id.in_(equipment_ids)
+    ).group_by(Booking.equipment_id, Booking.status).all()
+    
+    status_counts = {}
+    status_revenue = {}
+    equipment_counts = {}
+    for equipment_id, status, count, revenue in booking_stats:
+        status_counts[status] = status_counts.get(status, 0) + count
+        status_revenue[status] = status_revenue.get(status, 0) + revenue
+        equipment_counts[equipment_id] = equipment_counts.get(equipment_id, 0) + count
+    
+    total_bookings = sum(status_counts.values())
+    
+    # Completed earnings per equipment from the owner_daily_earnings rollup (already net of the platform fee)
+    equipment_earnings = {
+        equipment_id: (net, bookings) for equipment_id, net, bookings in db.session.query(
+            OwnerDailyEarnings.equipment_id,
+            func.sum(OwnerDailyEarnings.net),
+            func.sum(OwnerDailyEarnings.bookings)
+        ).filter(
+            OwnerDailyEarnings.owner_id == user_id
+        ).group_by(OwnerDailyEarnings.equipment_id).all()
+    }
     
     # Calculate total earnings (90% of rental cost after platform fee)
-    completed_bookings = [b for b in all_bookings if b.status == 'completed']
-    total_earnings = sum(b.total_cost * 0.9 for b in completed_bookings)
+    total_earnings = sum(net for net, _ in equipment_earnings.values())
     
     # Calculate pending earnings (confirmed and active bookings)
-    pending_bookings = [b for b in all_bookings if b.status in ['confirmed', 'active']]
-    pending_earnings = sum(b.total_cost * 0.9 for b in pending_bookings)
+    pending_earnings = (status_revenue.get('confirmed', 0) + status_revenue.get('active', 0)) * 0.9
     
     # Count active and completed rentals
-    active_rentals = len([b for b in all_bookings if b.status == 'active'])
-    completed_rentals = len(completed_bookings)
+    active_rentals = status_counts.get('active', 0)
+    completed_rentals = sum(bookings for _, bookings in equipment_earnings.values())
     
     # Calculate average rating across all equipment
-    ratings = [eq.average_rating for eq in equipment_list if eq.average_rating > 0]
+    ratings = [eq.average_rating for eq in equipment_list if eq.average_rating and eq.average_rating > 0]
     average_rating = sum(ratings) / len(ratings) if ratings else 0
     
     # Count total reviews
@@ -60,16 +94,12 @@ def get_owner_stats():
     # Equipment performance
     equipment_performance = []
     for eq in equipment_list:
-        eq_bookings = [b for b in all_bookings if b.equipment_id == eq.id]
-        eq_completed = [b for b in eq_bookings if b.status == 'completed']
-        eq_earnings = sum(b.total_cost * 0.9 for b in eq_completed)
-        
         equipment_performance.append({
             'equipment_id': eq.id,
             'equipment_name': eq.name,
-            'total_bookings': len(eq_bookings),
-            'completed_bookings': len(eq_completed),
-            'total_earnings': round(eq_earnings, 2),
+            'total_bookings': equipment_counts.get(eq.id, 0),
+            'completed_bookings': equipment_earnings.get(eq.id, (0, 0))[1],
+            'total_earnings': round(equipment_earnings.get(eq.id, (0, 0))[0], 2),
             'average_rating': eq.average_rating,
             'daily_price': eq.daily_price
         })
@@ -77,16 +107,23 @@ def get_owner_stats():
     # Sort by earnings
     equipment_performance.sort(key=lambda x: x['total_earnings'], reverse=True)
     
-    # Recent bookings (last 10)
-    recent_bookings = sorted(all_bookings, key=lambda x: x.created_at, reverse=True)[:10]
+    # Recent bookings (last 10) with equipment and renter names joined in
+    recent_bookings = db.session.query(
+        Booking, Equipment.name, User.first_name, User.last_name
+    ).join(
+        Equipment, Booking.equipment_id == Equipment.id
+    ).outerjoin(
+        User, Booking.renter_id == User.id
+    ).filter(
+        Booking.equipment_id.in_(equipment_ids)
+    ).order_by(Booking.created_at.desc(), Booking.id.desc()).limit(10).all()
+    
     recent_bookings_data = []
-    for booking in recent_bookings:
-        equipment = Equipment.query.get(booking.equipment_id)
-        renter = User.query.get(booking.renter_id)
+    for booking, equipment_name, renter_first_name, renter_last_name in recent_bookings:
         recent_bookings_data.append({
             'booking_id': booking.id,
-            'equipment_name': equipment.name if equipment else 'Unknown',
-            'renter_name': f"{renter.first_name} {renter.last_name}" if renter else 'Unknown',
+            'equipment_name': equipment_name or 'Unknown',
+            'renter_name': f"{renter_first_name} {renter_last_name}" if renter_first_name is not None else 'Unknown',
             'start_date': booking.start_date.isoformat() if booking.start_date else None,
             'end_date': booking.end_date.isoformat() if booking.end_date else None,
             'total_cost': booking.total_cost,
@@ -95,31 +132,39 @@ def get_owner_stats():
             'created_at': booking.created_at.isoformat() if booking.created_at else None
         })
     
-    # Earnings by month (last 12 months)
+    # Earnings by month (last 12 calendar months) from the rollup
     earnings_by_month = []
-    current_date = datetime.now()
+    current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    months = []
     for i in range(12):
-        month_start = (current_date - timedelta(days=30*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        month_bookings = [
-            b for b in completed_bookings 
-            if b.created_at and month_start <= b.created_at.replace(tzinfo=None) <= month_end
-        ]
-        month_earnings = sum(b.total_cost * 0.9 for b in month_bookings)
-        
+        year, month = divmod(current_month.year * 12 + current_month.month - 1 - i, 12)
+        months.append(current_month.replace(year=year, month=month + 1))
+    months.reverse()  # Oldest to newest
+    
+    month_key = month_bucket(OwnerDailyEarnings.day)
+    monthly_stats = dict(
+        (key, (net, count)) for key, net, count in db.session.query(
+            month_key,
+            func.sum(OwnerDailyEarnings.net),
+            func.sum(OwnerDailyEarnings.bookings)
+        ).filter(
+            OwnerDailyEarnings.owner_id == user_id,
+            OwnerDailyEarnings.day >= months[0].date()
+        ).group_by(month_key).all()
+    )
+    
+    for month_start in months:
+        month_earnings, month_count = monthly_stats.get(month_start.strftime('%Y-%m'), (0, 0))
         earnings_by_month.append({
             'month': month_start.strftime('%Y-%m'),
             'month_name': month_start.strftime('%B %Y'),
             'earnings': round(month_earnings, 2),
-            'bookings_count': len(month_bookings)
+            'bookings_count': month_count
         })
     
-    earnings_by_month.reverse()  # Oldest to newest
-    
     return jsonify({
         'total_equipment': len(equipment_list),
-        'total_bookings': len(all_bookings),
+        'total_bookings': total_bookings,
         'total_earnings': round(total_earnings, 2),
         'pending_earnings': round(pending_earnings, 2),
         'active_rentals': active_rentals,
@@ -149,12 +194,12 @@ def get_equipment_bookings():
     bookings = Booking.query.filter(Booking.equipment_id.in_(equipment_ids)).order_by(Booking.created_at.desc()).all()
     
     bookings_data = []
-    for booking in bookings:
-        equipment = Equipment.query.get(booking.equipment_id)
-        renter = User.query.get(booking.renter_id)
+    for booking, booking_data in zip(bookings, serialize_bookings(bookings)):
+        equipment = booking.equipment
+        renter = booking.renter
         
         bookings_data.append({
-            **booking.to_dict(),
+            **booking_data,
             'equipment_name': equipment.name if equipment else 'Unknown',
             'renter_name': f"{renter.first_name} {renter.last_name}" if renter else 'Unknown',
             'renter_email': renter.email if renter else None,
@@ -2,7 +2,19 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import db, User
 from src.models.equipment import Equipment
-from sqlalchemy import or_, and_, func
+from src.models.booking import Booking, ACTIVE_BOOKING_STATUSES
+from src.utils.search import apply_search
+from src.utils.autocomplete import autocomplete_index
+from src.utils.serializers import serialize_equipment_list
+from src.utils.facets import facet_index
+from src.utils.geo import geocode, geocode_equipment, parse_near, apply_radius, haversine_km, DEFAULT_RADIUS_KM, MAX_RADIUS_KM
+from src.utils.response_cache import cached_response, invalidate, invalidate_equipment
+from src.utils.pagination import (
+    keyset_page, cursor_for, encode_offset_cursor, decode_offset_cursor, cached_count, count_cache_key, InvalidCursor
+)
+from sqlalchemy import exists
+from datetime import datetime
+from sqlalchemy.orm import selectinload
 
 equipment_bp = Blueprint('equipment', __name__)
 
@@ -12,37 +24,37 @@ def get_all_equipment():
     Get all available equipment with advanced filtering and search
     
     Query Parameters:
-    - search: Search in name, description, capacity_spec
+    - search: Full-text search in name, description, capacity_spec, category
     - category: Filter by category
     - min_price: Minimum daily price
     - max_price: Maximum daily price
     - city: Filter by owner's city
     - state: Filter by owner's state
-    - sort_by: price_asc, price_desc, newest, oldest
-    - limit: Number of results (default 50)
-    - offset: Pagination offset (default 0)
+    - available_from / available_to: Only equipment with no booking overlapping
+      these dates (YYYY-MM-DD, inclusive)
+    - near: lat,lon (or a "City, ST" place name) to search around
+    - radius_km: Search radius around near (default 50, max 1000)
+    - sort_by: relevance, distance, price_asc, price_desc, newest, oldest
+      (defaults to relevance when searching, distance with near, newest otherwise)
+    - limit: Number of results (default 50, max 200)
+    - cursor: Opaque cursor from a previous page's next_cursor
+    - offset: Legacy pagination offset (default 0), prefer cursor
+    - include_total: true to include a cached total_count
     """
     
-    # Start with base query for available equipment
-    query = Equipment.query.filter_by(is_available=True)
+    # Start with base query for available equipment (owners loaded in one extra query)
+    query = Equipment.query.options(selectinload(Equipment.owner)).filter_by(is_available=True)
     
-    # Search functionality
+    # Search functionality (uses the full-text index, see src/utils/search.py)
     search_term = request.args.get('search', '').strip()
+    rank_order = None
     if search_term:
-        search_pattern = f"%{search_term}%"
-        query = query.filter(
-            or_(
-                Equipment.name.ilike(search_pattern),
-                Equipment.description.ilike(search_pattern),
-                Equipment.capacity_spec.ilike(search_pattern),
-                Equipment.category.ilike(search_pattern)
-            )
-        )
+        query, rank_order = apply_search(query, search_term)
     
     # Category filter
     category = request.args.get('category')
     if category and category != 'all':
-        query = query.filter_by(category=category)
+        query = query.filter(Equipment.category == category)
     
     # Price filters
     min_price = request.args.get('min_price', type=float)
@@ -53,6 +65,26 @@ def get_all_equipment():
     if max_price is not None:
         query = query.filter(Equipment.daily_price <= max_price)
     
+    # Availability window - one NOT EXISTS anti-join against Booking
+    available_from = request.args.get('available_from')
+    available_to = request.args.get('available_to')
+    if available_from or available_to:
+        try:
+            window_start = datetime.strptime(available_from or available_to, '%Y-%m-%d').date()
+            window_end = datetime.strptime(available_to or available_from, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        if window_end < window_start:
+            return jsonify({'error': 'available_to must not be before available_from'}), 400
+        
+        query = query.filter(~exists().where(
+            Booking.equipment_id == Equipment.id,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+            Booking.start_date <= window_end,
+            Booking.end_date >= window_start
+        ))
+    
     # Location filters (requires joining with User table)
     city = request.args.get('city')
     state = request.args.get('state')
@@ -64,114 +96,142 @@ def get_all_equipment():
         if state:
             query = query.filter(User.state.ilike(f"%{state}%"))
     
-    # Sorting
-    sort_by = request.args.get('sort_by', 'newest')
-    if sort_by == 'price_asc':
-        query = query.order_by(Equipment.daily_price.asc())
+    # Radius search - bounding box on the indexed coordinates, then exact distance
+    origin = None
+    distance_order = None
+    near = request.args.get('near')
+    if near:
+        try:
+            origin = parse_near(near)
+        except ValueError:
+            origin = geocode(location=near)
+        if origin is None:
+            return jsonify({'error': 'near must be "lat,lon" or a known "City, ST"'}), 400
+        radius_km = min(max(request.args.get('radius_km', DEFAULT_RADIUS_KM, type=float), 0.1), MAX_RADIUS_KM)
+        query, distance_order = apply_radius(query, Equipment.latitude, Equipment.longitude, origin[0], origin[1], radius_km)
+    
+    # Sorting - every mode ends in a unique id so it can be paged by cursor
+    default_sort = 'relevance' if rank_order is not None else ('distance' if origin else 'newest')
+    sort_by = request.args.get('sort_by', default_sort)
+    if sort_by == 'distance' and distance_order is not None:
+        # Like relevance, distance pages carry an offset in the cursor
+        order = None
+        rank_order = distance_order
+    elif sort_by == 'relevance' and rank_order is not None:
+        order = None
+    elif sort_by == 'price_asc':
+        order = [(Equipment.daily_price, 'asc'), (Equipment.id, 'asc')]
     elif sort_by == 'price_desc':
-        query = query.order_by(Equipment.daily_price.desc())
+        order = [(Equipment.daily_price, 'desc'), (Equipment.id, 'desc')]
     elif sort_by == 'oldest':
-        query = query.order_by(Equipment.created_at.asc())
+        order = [(Equipment.created_at, 'asc'), (Equipment.id, 'asc')]
     else:  # newest (default)
-        query = query.order_by(Equipment.created_at.desc())
+        sort_by = 'newest'
+        order = [(Equipment.created_at, 'desc'), (Equipment.id, 'desc')]
     
     # Pagination
-    limit = request.args.get('limit', 50, type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
     offset = request.args.get('offset', 0, type=int)
-    
-    # Get total count before pagination
-    total_count = query.count()
-    
-    # Apply pagination
-    equipment_list = query.limit(limit).offset(offset).all()
+    cursor = request.args.get('cursor')
+    
+    # Exact totals are expensive on every page, so they are opt-in and cached
+    total_count = None
+    if request.args.get('include_total', 'false').lower() == 'true':
+        total_count = cached_count(query, count_cache_key('equipment', request.args))
+    
+    if cursor and offset:
+        return jsonify({'error': 'Use either cursor or offset, not both'}), 400
+    offset = max(offset, 0)
+    
+    try:
+        if order is not None and not offset:
+            equipment_list, next_cursor = keyset_page(query, order, sort_by, cursor, limit)
+        elif order is not None:
+            # Legacy offset paging on a keyset sort: continue with a real keyset cursor
+            query = query.order_by(*[col.asc() if d == 'asc' else col.desc() for col, d in order])
+            rows = query.limit(limit + 1).offset(offset).all()
+            equipment_list = rows[:limit]
+            next_cursor = cursor_for(equipment_list[-1], order, sort_by) if len(rows) > limit else None
+        else:
+            # Relevance ranks aren't stable sort keys, so these pages carry an offset in the cursor
+            if cursor:
+                offset = decode_offset_cursor(sort_by, cursor)
+            query = query.order_by(rank_order, Equipment.created_at.desc(), Equipment.id.desc())
+            rows = query.limit(limit + 1).offset(offset).all()
+            equipment_list = rows[:limit]
+            next_cursor = encode_offset_cursor(sort_by, offset + limit) if len(rows) > limit else None
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    equipment_data = serialize_equipment_list(equipment_list)
+    if origin:
+        for item in equipment_data:
+            item['distance_km'] = round(haversine_km(origin[0], origin[1], item['latitude'], item['longitude']), 1)
     
     # Return results with metadata
     return jsonify({
-        'equipment': [item.to_dict() for item in equipment_list],
+        'equipment': equipment_data,
         'total_count': total_count,
         'limit': limit,
         'offset': offset,
-        'has_more': (offset + limit) < total_count
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
     }), 200
 
 @equipment_bp.route('/equipment/search', methods=['GET'])
 def search_equipment():
     """
     Dedicated search endpoint with autocomplete support
-    Returns matching equipment names and categories
+    Returns matching equipment names and categories, typo tolerant and
+    ranked by match quality, boost status and popularity
     """
     search_term = request.args.get('q', '').strip()
     
     if not search_term or len(search_term) < 2:
         return jsonify({'suggestions': []}), 200
     
-    search_pattern = f"%{search_term}%"
-    
-    # Search in equipment names
-    equipment_matches = Equipment.query.filter(
-        Equipment.is_available == True,
-        Equipment.name.ilike(search_pattern)
-    ).limit(10).all()
-    
-    suggestions = []
-    for item in equipment_matches:
-        suggestions.append({
-            'type': 'equipment',
-            'id': item.id,
-            'name': item.name,
-            'category': item.category,
-            'price': item.daily_price,
-            'image_url': item.image_url
-        })
+    # Answered from the in-process trigram index, no database round trip
+    suggestions = autocomplete_index.suggest(search_term, limit=10)
     
     return jsonify({'suggestions': suggestions}), 200
 
 @equipment_bp.route('/equipment/filters', methods=['GET'])
+@cached_response('equipment_filters', ttl=60)
 def get_filter_options():
     """
     Get available filter options (categories, price range, locations)
     Useful for building filter UI
-    """
     
-    # Get all unique categories
-    categories = db.session.query(Equipment.category).filter(
-        Equipment.is_available == True
-    ).distinct().all()
-    categories = [cat[0] for cat in categories if cat[0]]
-    
-    # Get price range
-    price_stats = db.session.query(
-        func.min(Equipment.daily_price).label('min_price'),
-        func.max(Equipment.daily_price).label('max_price'),
-        func.avg(Equipment.daily_price).label('avg_price')
-    ).filter(Equipment.is_available == True).first()
-    
-    # Get available locations (cities and states)
-    locations = db.session.query(
-        User.city, User.state
-    ).join(Equipment, Equipment.owner_id == User.id).filter(
-        Equipment.is_available == True,
-        User.city.isnot(None),
-        User.state.isnot(None)
-    ).distinct().all()
-    
-    cities = list(set([loc.city for loc in locations if loc.city]))
-    states = list(set([loc.state for loc in locations if loc.state]))
+    Also returns facet counts (per category, price bucket, city and state)
+    for the filters currently applied: category, min_price, max_price,
+    city, state. Counted from the in-memory snapshot in src/utils/facets.py.
+    """
+    category = request.args.get('category')
+    summary = facet_index.summary()
+    facets = facet_index.counts(
+        category=category if category and category != 'all' else None,
+        min_price=request.args.get('min_price', type=float),
+        max_price=request.args.get('max_price', type=float),
+        city=request.args.get('city'),
+        state=request.args.get('state')
+    )
     
     return jsonify({
-        'categories': sorted(categories),
+        'categories': summary['categories'],
         'price_range': {
-            'min': float(price_stats.min_price) if price_stats.min_price else 0,
-            'max': float(price_stats.max_price) if price_stats.max_price else 1000,
-            'avg': float(price_stats.avg_price) if price_stats.avg_price else 100
+            'min': float(summary['min_price']) if summary['min_price'] else 0,
+            'max': float(summary['max_price']) if summary['max_price'] else 1000,
+            'avg': float(summary['avg_price']) if summary['avg_price'] else 100
         },
         'locations': {
-            'cities': sorted(cities),
-            'states': sorted(states)
-        }
+            'cities': summary['cities'],
+            'states': summary['states']
+        },
+        'facets': facets
     }), 200
 
 @equipment_bp.route('/equipment/<int:equipment_id>', methods=['GET'])
+@cached_response('equipment:{equipment_id}', ttl=300, max_age=60)
 def get_equipment(equipment_id):
     """Get a specific equipment item with owner details"""
     equipment = Equipment.query.get(equipment_id)
@@ -245,9 +305,12 @@ def create_equipment():
         security_deposit=float(data.get('security_deposit', 0)),  # Owner-specified deposit
         is_available=data.get('is_available', True)
     )
+    geocode_equipment(new_equipment, owner=user, online=False)
     
     db.session.add(new_equipment)
     db.session.commit()
+    autocomplete_index.upsert(new_equipment)
+    invalidate('equipment_filters')
     
     return jsonify({
         'message': 'Equipment created successfully',
@@ -295,12 +358,15 @@ def update_equipment(equipment_id):
         equipment.image_urls = json.dumps([data['image_url']]) if data['image_url'] else None
     if 'location' in data:
         equipment.location = data['location']
+        geocode_equipment(equipment, online=False)
     if 'security_deposit' in data:
         equipment.security_deposit = float(data['security_deposit'])
     if 'is_available' in data:
         equipment.is_available = data['is_available']
     
     db.session.commit()
+    autocomplete_index.upsert(equipment)
+    invalidate_equipment(equipment_id)
     
     return jsonify({
         'message': 'Equipment updated successfully',
@@ -323,6 +389,8 @@ def delete_equipment(equipment_id):
     
     db.session.delete(equipment)
     db.session.commit()
+    autocomplete_index.remove(equipment_id)
+    invalidate_equipment(equipment_id)
     
     return jsonify({'message': 'Equipment deleted successfully'}), 200
 
@@ -333,5 +401,5 @@ def get_my_equipment():
     user_id = int(get_jwt_identity())
     equipment_list = Equipment.query.filter_by(owner_id=user_id).all()
     
-    return jsonify([item.to_dict() for item in equipment_list]), 200
+    return jsonify(serialize_equipment_list(equipment_list)), 200
 
@@ -0,0 +1,83 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+from flask import Blueprint, Response, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, create_access_token
+from src.utils.events import event_broker
+
+events_bp = Blueprint('events', __name__)
+
+# Comment line sent when idle so proxies don't close the connection
+HEARTBEAT_SECONDS = 15
+# Streams end after this long and the browser reconnects, so no worker thread is held forever
+STREAM_SECONDS = 300
+RETRY_MILLISECONDS = 3000
+# Each open stream holds a request thread; keep the rest of the worker's threads for the API
+MAX_STREAMS_PER_WORKER = int(os.environ.get('SSE_MAX_STREAMS', '8'))
+BUSY_RETRY_SECONDS = 30
+# Stream tokens end up in URLs (and access logs), so they only open a stream and expire quickly
+STREAM_TOKEN_SCOPE = 'events'
+STREAM_TOKEN_SECONDS = 60
+
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS_PER_WORKER)
+
+
+@events_bp.route('/events/token', methods=['POST'])
+@jwt_required()
+def create_stream_token():
+    """Short-lived token for EventSource, which can't send an Authorization header"""
+    token = create_access_token(
+        identity=get_jwt_identity(),
+        additional_claims={'scope': STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_SECONDS)
+    )
+    return jsonify({'token': token, 'expires_in': STREAM_TOKEN_SECONDS}), 200
+
+
+def is_stream_only_token(jwt_data):
+    return jwt_data.get('scope') == STREAM_TOKEN_SCOPE
+
+
+@events_bp.route('/events/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def event_stream():
+    """
+    Server-sent events for the current user: `message` for new messages and
+    `booking_status` for booking and payment changes.
+    EventSource can't set headers, so a token from POST /events/token may be
+    passed as ?jwt= (regular access tokens are only accepted in the header).
+    """
+    if request.args.get('jwt') and not is_stream_only_token(get_jwt()):
+        return jsonify({'error': 'Use a stream token from /api/events/token in the URL'}), 401
+    user_id = int(get_jwt_identity())
+
+    if not _stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open event streams, try again shortly'})
+        response.headers['Retry-After'] = str(BUSY_RETRY_SECONDS)
+        return response, 503
+
+    def generate():
+        subscription = event_broker.subscribe(user_id)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            deadline = time.monotonic() + STREAM_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event, data = subscription.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_broker.unsubscribe(user_id, subscription)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(_stream_slots.release)
+    return response
@@ -2,7 +2,13 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import db, User
 from src.models.equipment import Equipment
-from src.models.message import Message
+from src.models.message import Message, Conversation
+from src.utils.conversations import record_message, mark_conversations_read, decrement_unread, inbox_query
+from src.utils.pagination import keyset_page, InvalidCursor
+from sqlalchemy import func, false
+from sqlalchemy.orm import selectinload
+from src.utils.events import publish_new_message
+from src.utils.digests import wants_instant_message_email
 from src.utils.email_notifications import send_new_message_notification_email
 
 messages_bp = Blueprint('messages', __name__)
@@ -37,16 +43,21 @@ def send_message(equipment_id):
     )
     
     db.session.add(new_message)
-    db.session.commit()
+    db.session.flush()
+    record_message(new_message)
     
-    # Send email notification to receiver
+    # Queue an email notification to receiver with the message, unless they get digests instead
     try:
         sender = User.query.get(sender_id)
         receiver = User.query.get(receiver_id)
-        send_new_message_notification_email(new_message, sender, receiver, equipment)
+        if wants_instant_message_email(receiver):
+            send_new_message_notification_email(new_message, sender, receiver, equipment)
     except Exception as e:
         print(f"Error sending message notification email: {e}")
     
+    db.session.commit()
+    publish_new_message(new_message)
+    
     return jsonify({
         'message': 'Message sent successfully',
         'data': new_message.to_dict()
@@ -55,7 +66,11 @@ def send_message(equipment_id):
 @messages_bp.route('/equipment/<int:equipment_id>/messages', methods=['GET'])
 @jwt_required()
 def get_equipment_messages(equipment_id):
-    """Get all messages for an equipment item (for owner and interested renters)"""
+    """
+    Get messages for an equipment item (for owner and interested renters)
+    With ?limit= only the newest page is returned (oldest first); pass the
+    X-Next-Cursor header value back as ?before_id= to load earlier messages.
+    """
     user_id = int(get_jwt_identity())
     
     # Get equipment
@@ -63,75 +78,94 @@ def get_equipment_messages(equipment_id):
     if not equipment:
         return jsonify({'error': 'Equipment not found'}), 404
     
+    # Mark the whole thread read in one statement, committing only if anything changed
+    updated = Message.query.filter(
+        Message.receiver_id == user_id,
+        Message.equipment_id == equipment_id,
+        Message.is_read == false()
+    ).update({'is_read': True}, synchronize_session=False)
+    if updated:
+        mark_conversations_read(user_id, equipment_id)
+        db.session.commit()
+    
     # Get messages where user is sender or receiver
-    messages = Message.query.filter(
+    query = Message.query.filter(
         Message.equipment_id == equipment_id,
         db.or_(
             Message.sender_id == user_id,
             Message.receiver_id == user_id
         )
-    ).order_by(Message.created_at.asc()).all()
-    
-    # Mark received messages as read
-    for msg in messages:
-        if msg.receiver_id == user_id and not msg.is_read:
-            msg.is_read = True
-    
-    db.session.commit()
-    
-    return jsonify([msg.to_dict() for msg in messages]), 200
+    ).options(selectinload(Message.sender), selectinload(Message.receiver))
+    
+    limit = request.args.get('limit', type=int)
+    if not limit:
+        messages = query.order_by(Message.created_at.asc(), Message.id.asc()).all()
+        return jsonify([msg.to_dict() for msg in messages]), 200
+    
+    limit = max(1, min(limit, 200))
+    before_id = request.args.get('before_id', type=int)
+    if before_id:
+        query = query.filter(Message.id < before_id)
+    rows = query.order_by(Message.id.desc()).limit(limit + 1).all()
+    messages = list(reversed(rows[:limit]))
+    
+    response = jsonify([msg.to_dict() for msg in messages])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = str(messages[0].id)
+    return response, 200
 
 @messages_bp.route('/messages', methods=['GET'])
 @jwt_required()
 def get_my_messages():
-    """Get all message conversations for current user"""
+    """
+    Get message conversations for current user, most recent first
+    With ?limit= the list is paged and the next cursor is sent in X-Next-Cursor
+    """
     user_id = int(get_jwt_identity())
     
-    # Get all messages where user is sender or receiver
-    messages = Message.query.filter(
-        db.or_(
-            Message.sender_id == user_id,
-            Message.receiver_id == user_id
-        )
-    ).order_by(Message.created_at.desc()).all()
-    
-    # Group by equipment and conversation partner
-    conversations = {}
-    for msg in messages:
-        equipment_id = msg.equipment_id
-        partner_id = msg.sender_id if msg.receiver_id == user_id else msg.receiver_id
-        
-        key = f"{equipment_id}_{partner_id}"
-        
-        if key not in conversations:
-            conversations[key] = {
-                'equipment_id': equipment_id,
-                'equipment_name': msg.equipment.name if msg.equipment else None,
-                'partner_id': partner_id,
-                'partner_name': f"{msg.sender.first_name} {msg.sender.last_name}" if msg.receiver_id == user_id else f"{msg.receiver.first_name} {msg.receiver.last_name}",
-                'last_message': msg.message,
-                'last_message_time': msg.created_at.isoformat() if msg.created_at else None,
-                'unread_count': 0
-            }
-        
-        # Count unread messages
-        if msg.receiver_id == user_id and not msg.is_read:
-            conversations[key]['unread_count'] += 1
-    
-    return jsonify(list(conversations.values())), 200
+    # One indexed query over conversation summaries, names loaded in bulk
+    query = inbox_query(user_id).options(
+        selectinload(Conversation.equipment),
+        selectinload(Conversation.user_low),
+        selectinload(Conversation.user_high)
+    )
+    order = [(Conversation.last_message_at, 'desc'), (Conversation.id, 'desc')]
+    
+    limit = request.args.get('limit', type=int)
+    next_cursor = None
+    if limit:
+        try:
+            conversations, next_cursor = keyset_page(query, order, 'recent', request.args.get('cursor'), max(1, min(limit, 100)))
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        conversations = query.order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).all()
+    
+    response = jsonify([conversation.to_dict(user_id) for conversation in conversations])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
 
 @messages_bp.route('/messages/unread-count', methods=['GET'])
 @jwt_required()
 def get_unread_count():
-    """Get count of unread messages"""
+    """
+    Get count of unread messages
+    Polled by the frontend, so it is answered from a partial index and
+    carries an ETag; an unchanged count returns 304 with no body.
+    """
     user_id = int(get_jwt_identity())
     
-    unread_count = Message.query.filter_by(
-        receiver_id=user_id,
-        is_read=False
-    ).count()
+    # Literal false so the predicate matches the partial index on both dialects
+    unread_count = db.session.query(func.count(Message.id)).filter(
+        Message.receiver_id == user_id,
+        Message.is_read == false()
+    ).scalar()
     
-    return jsonify({'unread_count': unread_count}), 200
+    response = jsonify({'unread_count': unread_count})
+    response.set_etag(f"unread-{user_id}-{unread_count}")
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @messages_bp.route('/messages/<int:message_id>/read', methods=['PUT'])
 @jwt_required()
@@ -146,8 +180,10 @@ def mark_message_read(message_id):
     if message.receiver_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    message.is_read = True
-    db.session.commit()
+    if not message.is_read:
+        message.is_read = True
+        decrement_unread(message)
+        db.session.commit()
     
     return jsonify({'message': 'Message marked as read'}), 200
 
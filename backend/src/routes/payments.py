@@ -7,6 +7,10 @@ from src.models.booking import Booking
 from src.models.payment import Payment
 from src.models.equipment import Equipment
 from src.utils.email_notifications import send_payment_confirmation_email
+from src.utils.earnings import complete_booking
+from src.utils.availability import invalidate_blocked_dates
+from src.utils.events import publish_booking_status
+from src.models.earnings import OwnerDailyEarnings
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -139,9 +143,7 @@ def confirm_payment():
     if booking:
         booking.status = 'confirmed'
     
-    db.session.commit()
-    
-    # Send payment confirmation email
+    # Queue payment confirmation email, committed together with the payment
     try:
         equipment = Equipment.query.get(booking.equipment_id)
         renter = User.query.get(booking.renter_id)
@@ -150,6 +152,11 @@ def confirm_payment():
     except Exception as e:
         print(f"Error sending payment confirmation email: {e}")
     
+    db.session.commit()
+    if booking:
+        invalidate_blocked_dates(booking.equipment_id)
+        publish_booking_status(booking, booking.equipment.owner_id)
+    
     return jsonify({
         'message': 'Payment confirmed successfully',
         'note': 'Payment received! Owner will receive their payout (90% of rental cost) after you return the equipment and they confirm its condition.',
@@ -193,6 +200,11 @@ def confirm_return():
     if not deposit_payment:
         return jsonify({'error': 'Deposit payment not found'}), 404
     
+    # Claim the completion before moving any money, so a repeated or concurrent
+    # confirmation can't refund or pay out twice
+    if not complete_booking(booking):
+        return jsonify({'error': 'Return was already confirmed'}), 409
+    
     try:
         refund_amount = deposit_payment.amount
         
@@ -213,9 +225,11 @@ def confirm_return():
         
         # Refund the remaining deposit (or full deposit if no damage)
         if refund_amount > 0:
+            # A retry after a later step failed (and rolled back the claim) gets this same refund back
             refund = stripe.Refund.create(
                 payment_intent=deposit_payment.stripe_payment_id,
-                amount=int(refund_amount * 100)
+                amount=int(refund_amount * 100),
+                idempotency_key=f"booking-{booking.id}-refund"
             )
             
             # Create refund payment record
@@ -244,6 +258,7 @@ def confirm_return():
             amount=int(total_owner_payout * 100),
             currency='usd',
             destination=owner.stripe_account_id,
+            idempotency_key=f"booking-{booking.id}-transfer",
             metadata={
                 'booking_id': booking_id,
                 'rental_payout': owner_rental_payout,
@@ -263,10 +278,8 @@ def confirm_return():
         )
         db.session.add(payout_payment)
         
-        # Update booking status to completed
-        booking.status = 'completed'
-        
         db.session.commit()
+        invalidate_blocked_dates(booking.equipment_id)
         
         return jsonify({
             'message': 'Equipment return confirmed successfully',
@@ -285,6 +298,7 @@ def confirm_return():
         }), 200
         
     except stripe.error.StripeError as e:
+        db.session.rollback()
         return jsonify({
             'error': 'Refund processing error',
             'message': str(e)
@@ -337,15 +351,14 @@ def get_my_earnings():
     if not user or user.user_type not in ['owner', 'both']:
         return jsonify({'error': 'Only equipment owners can view earnings'}), 403
     
-    # Get all completed bookings for this owner's equipment
+    # Lifetime totals from the owner_daily_earnings rollup
     from sqlalchemy import func
     
     earnings = db.session.query(
-        func.sum(Booking.total_cost).label('total_revenue'),
-        func.count(Booking.id).label('total_bookings')
-    ).join(Equipment).filter(
-        Equipment.owner_id == user_id,
-        Booking.status == 'completed'
+        func.sum(OwnerDailyEarnings.gross).label('total_revenue'),
+        func.sum(OwnerDailyEarnings.bookings).label('total_bookings')
+    ).filter(
+        OwnerDailyEarnings.owner_id == user_id
     ).first()
     
     total_revenue = earnings.total_revenue or 0
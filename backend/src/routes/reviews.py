@@ -4,6 +4,7 @@ from src.models.user import db, User
 from src.models.equipment import Equipment
 from src.models.booking import Booking
 from src.models.review import Review
+from src.utils.response_cache import cached_response, invalidate
 
 reviews_bp = Blueprint('reviews', __name__)
 
@@ -66,6 +67,9 @@ def create_review(booking_id):
     # Update owner average rating
     update_owner_rating(equipment.owner_id)
     
+    # Reviews list and the listing's average rating changed
+    invalidate(f"equipment_reviews:{booking.equipment_id}", f"equipment:{booking.equipment_id}")
+    
     return jsonify({
         'message': 'Review submitted successfully',
         'review': new_review.to_dict()
@@ -73,6 +77,7 @@ def create_review(booking_id):
 
 
 @reviews_bp.route('/equipment/<int:equipment_id>/reviews', methods=['GET'])
+@cached_response('equipment_reviews:{equipment_id}', ttl=300, max_age=60)
 def get_equipment_reviews(equipment_id):
     """Get all reviews for an equipment item"""
     equipment = Equipment.query.get(equipment_id)
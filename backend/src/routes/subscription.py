@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import User, db
+from src.utils.response_cache import cached_response
 from datetime import datetime, timedelta
 import stripe
 import os
@@ -97,6 +98,7 @@ PRICING_TIERS = {
 }
 
 @subscription_bp.route('/pricing', methods=['GET'])
+@cached_response('subscription_pricing', ttl=3600)
 def get_pricing():
     """Get pricing tiers and features"""
     return jsonify({
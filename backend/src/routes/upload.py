@@ -1,22 +1,40 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import base64
+import hashlib
 import os
-import uuid
-from datetime import datetime
+from src.utils.images import (
+    UPLOAD_FOLDER, PLACEHOLDER_SVG, content_filename, is_content_addressed,
+    store_image, store_image_file, resolve_upload, is_pending, image_status, InvalidImage
+)
+from src.utils.file_serving import X_ACCEL_UPLOADS_PREFIX, IMMUTABLE_MAX_AGE, serve_file
+from src.utils.storage import get_storage
+from src.utils.upload_sessions import (
+    UploadError, create_session, get_session, write_chunk, finish_session, discard_session
+)
 
 upload_bp = Blueprint('upload', __name__)
 
 # Directory to store uploaded images
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+# Redirects to presigned storage URLs must expire before the URL does
+REDIRECT_MAX_AGE = 300
+
+
+def save_upload(data, file_extension):
+    """Store image bytes (deduplicated by content hash) for background processing, returns (url, variant urls)"""
+    filename = content_filename(hashlib.sha256(data).hexdigest(), file_extension)
+    variants = store_image(data, filename)
+    return f"/uploads/{filename}", variants
+
+
 @upload_bp.route('/upload/image', methods=['POST'])
 @jwt_required()
 def upload_image():
     """Upload an image (base64 or file upload)"""
-    user_id = int(get_jwt_identity())
-    
     # Check if base64 data
     if request.is_json:
         data = request.get_json()
@@ -33,23 +51,23 @@ def upload_image():
             
             image_bytes = base64.b64decode(image_data)
             
-            # Generate unique filename
-            file_extension = data.get('extension', 'jpg')
-            filename = f"{user_id}_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_extension}"
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
+            file_extension = data.get('extension', 'jpg').lower()
+            if file_extension not in ALLOWED_EXTENSIONS:
+                return jsonify({'error': 'Invalid file type. Allowed: png, jpg, jpeg, gif, webp'}), 400
             
-            # Save file
-            with open(filepath, 'wb') as f:
-                f.write(image_bytes)
+            if len(image_bytes) > MAX_FILE_SIZE:
+                return jsonify({'error': 'File too large. Maximum size is 5MB'}), 400
             
-            # Return URL
-            image_url = f"/uploads/{filename}"
+            image_url, variants = save_upload(image_bytes, file_extension)
             
             return jsonify({
                 'message': 'Image uploaded successfully',
-                'image_url': image_url
+                'image_url': image_url,
+                'variants': variants
             }), 201
             
+        except InvalidImage as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': f'Failed to upload image: {str(e)}'}), 500
     
@@ -63,10 +81,9 @@ def upload_image():
         return jsonify({'error': 'No file selected'}), 400
     
     # Validate file type
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
     
-    if file_extension not in allowed_extensions:
+    if file_extension not in ALLOWED_EXTENSIONS:
         return jsonify({'error': 'Invalid file type. Allowed: png, jpg, jpeg, gif, webp'}), 400
     
     # Validate file size (max 5MB)
@@ -74,25 +91,20 @@ def upload_image():
     file_size = file.tell()
     file.seek(0)  # Reset file pointer
     
-    if file_size > 5 * 1024 * 1024:  # 5MB
+    if file_size > MAX_FILE_SIZE:
         return jsonify({'error': 'File too large. Maximum size is 5MB'}), 400
     
     try:
-        # Generate unique filename
-        filename = f"{user_id}_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_extension}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Save file
-        file.save(filepath)
-        
-        # Return URL
-        image_url = f"/uploads/{filename}"
+        image_url, variants = save_upload(file.read(), file_extension)
         
         return jsonify({
             'message': 'Image uploaded successfully',
-            'image_url': image_url
+            'image_url': image_url,
+            'variants': variants
         }), 201
         
+    except InvalidImage as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to upload image: {str(e)}'}), 500
 
@@ -100,8 +112,6 @@ def upload_image():
 @jwt_required()
 def upload_multiple_images():
     """Upload multiple images at once"""
-    user_id = int(get_jwt_identity())
-    
     if 'files' not in request.files:
         return jsonify({'error': 'No files provided'}), 400
     
@@ -115,7 +125,7 @@ def upload_multiple_images():
         return jsonify({'error': 'Maximum 5 images allowed'}), 400
     
     uploaded_urls = []
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    uploaded_variants = []
     
     try:
         for file in files:
@@ -125,7 +135,7 @@ def upload_multiple_images():
             # Validate file type
             file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
             
-            if file_extension not in allowed_extensions:
+            if file_extension not in ALLOWED_EXTENSIONS:
                 continue
             
             # Validate file size (max 5MB)
@@ -133,34 +143,185 @@ def upload_multiple_images():
             file_size = file.tell()
             file.seek(0)  # Reset file pointer
             
-            if file_size > 5 * 1024 * 1024:  # 5MB
+            if file_size > MAX_FILE_SIZE:
                 continue
             
-            # Generate unique filename
-            filename = f"{user_id}_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_extension}"
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
-            # Save file
-            file.save(filepath)
+            # Skip files that aren't decodable images
+            try:
+                image_url, variants = save_upload(file.read(), file_extension)
+            except InvalidImage:
+                continue
             
             # Add URL to list
-            image_url = f"/uploads/{filename}"
             uploaded_urls.append(image_url)
+            uploaded_variants.append(variants)
         
         if not uploaded_urls:
             return jsonify({'error': 'No valid images uploaded'}), 400
         
         return jsonify({
             'message': f'{len(uploaded_urls)} images uploaded successfully',
-            'image_urls': uploaded_urls
+            'image_urls': uploaded_urls,
+            'variants': uploaded_variants
         }), 201
         
     except Exception as e:
         return jsonify({'error': f'Failed to upload images: {str(e)}'}), 500
 
-@upload_bp.route('/uploads/<filename>')
+def session_json(state):
+    return {
+        'upload_id': state['upload_id'],
+        'offset': state['offset'],
+        'size': state['size'],
+        'complete': state['offset'] == state['size']
+    }
+
+
+@upload_bp.route('/upload/sessions', methods=['POST'])
+@jwt_required()
+def create_upload_session():
+    """
+    Start a streaming, resumable upload: {"size": <bytes>, "extension": "jpg"}.
+    Send the bytes with PUT /upload/sessions/<upload_id> and an Upload-Offset header.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    
+    file_extension = str(data.get('extension', 'jpg')).lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        return jsonify({'error': 'Invalid file type. Allowed: png, jpg, jpeg, gif, webp'}), 400
+    
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size is required'}), 400
+    if size <= 0:
+        return jsonify({'error': 'size must be positive'}), 400
+    if size > MAX_FILE_SIZE:
+        return jsonify({'error': 'File too large. Maximum size is 5MB'}), 400
+    
+    state = create_session(user_id, file_extension, size)
+    return jsonify(session_json(state)), 201
+
+
+@upload_bp.route('/upload/sessions/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload_session(upload_id):
+    """Bytes received so far, i.e. where to resume"""
+    try:
+        state = get_session(upload_id, int(get_jwt_identity()))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    response = jsonify(session_json(state))
+    response.headers['Upload-Offset'] = str(state['offset'])
+    return response, 200
+
+
+@upload_bp.route('/upload/sessions/<upload_id>', methods=['PUT', 'PATCH'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """
+    Append the raw request body at the Upload-Offset header (or ?offset=).
+    The last chunk finishes the upload and returns the image URLs.
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    
+    try:
+        state = write_chunk(upload_id, user_id, offset, request.stream)
+    except UploadError as e:
+        body = {'error': str(e)}
+        if e.offset is not None:
+            body['offset'] = e.offset
+        return jsonify(body), e.status
+    
+    if state['offset'] < state['size']:
+        response = jsonify(session_json(state))
+        response.headers['Upload-Offset'] = str(state['offset'])
+        return response, 200
+    
+    # Complete: hand the file to the image pipeline without reading it into memory
+    part_path = finish_session(upload_id)
+    filename = content_filename(state['sha256'], state['extension'])
+    try:
+        variants = store_image_file(part_path, filename)
+    except InvalidImage as e:
+        discard_session(upload_id)
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        # A retried final chunk raced the one that already finished
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    return jsonify({
+        'message': 'Image uploaded successfully',
+        'image_url': f"/uploads/{filename}",
+        'variants': variants,
+        'sha256': state['sha256'],
+        'size': state['size']
+    }), 201
+
+
+@upload_bp.route('/upload/sessions/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload_session(upload_id):
+    """Abandon an upload and delete the bytes received so far"""
+    try:
+        get_session(upload_id, int(get_jwt_identity()))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    discard_session(upload_id)
+    return jsonify({'message': 'Upload cancelled'}), 200
+
+
+@upload_bp.route('/upload/status', methods=['GET'])
+@jwt_required()
+def upload_status():
+    """Processing status of uploaded images, e.g. ?url=/uploads/a.jpg&url=/uploads/b.png"""
+    urls = request.args.getlist('url')[:50]
+    if not urls:
+        return jsonify({'error': 'At least one url is required'}), 400
+    return jsonify({'images': {url: image_status(url) for url in urls}}), 200
+
+@upload_bp.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    """Serve uploaded images"""
-    from flask import send_from_directory
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """Serve uploaded images and their size variants"""
+    return send_upload(filename)
+
+
+def send_upload(filename):
+    """
+    Send an upload, negotiating AVIF variants and falling back to the original.
+    With a remote storage backend this is a redirect to the stored object.
+    """
+    from flask import abort, redirect
+    resolved = resolve_upload(filename, request.headers.get('Accept', ''))
+    if resolved is None:
+        if is_pending(filename):
+            # Still being processed: a placeholder the browser must not keep
+            response = current_app.response_class(PLACEHOLDER_SVG, mimetype='image/svg+xml')
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        if get_storage().remote:
+            # Processed on another machine: the bucket is the source of truth
+            response = redirect(get_storage().url(filename), 302)
+            response.cache_control.max_age = REDIRECT_MAX_AGE
+            return response
+        abort(404)
+    path, negotiated = resolved
+    # A variant URL answered with its original (not generated yet) must stay revalidatable
+    immutable = is_content_addressed(path) and (path == filename or negotiated)
+    
+    storage = get_storage()
+    if storage.remote:
+        response = redirect(storage.url(path), 302)
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE if immutable and storage.public_url else REDIRECT_MAX_AGE
+    else:
+        response = serve_file(UPLOAD_FOLDER, path, X_ACCEL_UPLOADS_PREFIX, immutable=immutable)
+    if negotiated:
+        response.vary.add('Accept')
+    return response
 
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from src.models.user import db, User
 from src.models.booking import Booking
+from src.utils.response_cache import cached_response
 
 verification_bp = Blueprint('verification', __name__)
 
@@ -223,6 +224,7 @@ def check_rental_eligibility():
     }), 200
 
 @verification_bp.route('/trust-levels', methods=['GET'])
+@cached_response('trust_levels', ttl=3600)
 def get_trust_levels():
     """Get information about all trust levels"""
     return jsonify({
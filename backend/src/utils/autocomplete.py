@@ -0,0 +1,272 @@
+"""
+In-process autocomplete index for equipment names
+
+Names are broken into padded trigrams ("  t", " te", "ten", ...) and kept in
+an inverted index, so a suggestion lookup never touches the database. The
+index is built lazily on first use, kept current by the equipment/boost
+routes calling upsert()/remove(), and fully rebuilt every REFRESH_SECONDS so
+changes made by other gunicorn workers show up without a restart.
+
+Only the first build blocks a request. After that a stale index keeps
+answering while a single background thread rebuilds it; changes made while
+it runs are replayed onto the new index (upserts and removals only; the
+rebuild reads booking counts itself).
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 300
+MIN_SIMILARITY = 0.45
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(value):
+    """Lowercase and collapse a string to space separated word tokens"""
+    return ' '.join(WORD_PATTERN.findall((value or '').lower()))
+
+
+def trigrams(value, pad_end=True):
+    """Padded trigrams for every word in value"""
+    grams = set()
+    for word in value.split():
+        padded = f"  {word} " if pad_end else f"  {word}"
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def within_one_edit(a, b):
+    """True if a and b differ by at most one substitution, insertion, deletion or transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len(a) > len(b):
+        a, b = b, a
+    for i in range(len(b)):
+        if a == b[:i] + b[i + 1:]:
+            return True
+    return False
+
+
+class AutocompleteIndex:
+    """Trigram index over available equipment names, ranked by match quality, boost and popularity"""
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # Held for the whole rebuild, so only one runs at a time
+        self._rebuild_lock = threading.Lock()
+        # Upserts and removals made while a rebuild is loading, replayed onto its result
+        self._changes = None
+        self._entries = {}
+        self._postings = defaultdict(set)
+        self._max_popularity = 0
+        self._built_at = None
+
+    # ---------- maintenance ----------
+
+    def rebuild(self):
+        """Load every available listing and its booking count from the database"""
+        from sqlalchemy import func
+        from src.models.user import db
+        from src.models.equipment import Equipment
+        from src.models.booking import Booking
+
+        with self._lock:
+            self._changes = []
+        try:
+            booking_counts = dict(
+                db.session.query(Booking.equipment_id, func.count(Booking.id))
+                .group_by(Booking.equipment_id).all()
+            )
+            rows = Equipment.query.filter_by(is_available=True).all()
+        except Exception:
+            with self._lock:
+                self._changes = None
+            raise
+
+        entries = {}
+        postings = defaultdict(set)
+        for equipment in rows:
+            entry = self._make_entry(equipment, booking_counts.get(equipment.id, 0))
+            entries[equipment.id] = entry
+            for gram in entry['grams']:
+                postings[gram].add(equipment.id)
+
+        with self._lock:
+            self._entries = entries
+            self._postings = postings
+            self._max_popularity = max((e['popularity'] for e in entries.values()), default=0)
+            changes, self._changes = self._changes or [], None
+            for apply, argument in changes:
+                apply(argument)
+            self._built_at = time.monotonic()
+
+    def upsert(self, equipment):
+        """Add or refresh a single listing after it was created or edited"""
+        if not equipment.is_available:
+            self.remove(equipment.id)
+            return
+        entry = self._make_entry(equipment, 0)
+        with self._lock:
+            self._record_locked(self._upsert_locked, entry)
+            if self._built_at is not None:
+                self._upsert_locked(entry)
+
+    def remove(self, equipment_id):
+        """Drop a listing that was deleted or made unavailable"""
+        with self._lock:
+            self._record_locked(self._remove_locked, equipment_id)
+            self._remove_locked(equipment_id)
+
+    def record_booking(self, equipment_id):
+        """Bump a listing's popularity when it is booked"""
+        # Not replayed after a rebuild: its booking counts may already include this one
+        with self._lock:
+            self._bump_locked(equipment_id)
+
+    def _record_locked(self, apply, argument):
+        if self._changes is not None:
+            self._changes.append((apply, argument))
+
+    def _upsert_locked(self, entry):
+        previous = self._entries.get(entry['id'])
+        entry = dict(entry, popularity=previous['popularity'] if previous else entry['popularity'])
+        self._remove_locked(entry['id'])
+        self._entries[entry['id']] = entry
+        for gram in entry['grams']:
+            self._postings[gram].add(entry['id'])
+
+    def _bump_locked(self, equipment_id):
+        entry = self._entries.get(equipment_id)
+        if entry:
+            entry['popularity'] += 1
+            self._max_popularity = max(self._max_popularity, entry['popularity'])
+
+    def _remove_locked(self, equipment_id):
+        entry = self._entries.pop(equipment_id, None)
+        if entry:
+            for gram in entry['grams']:
+                self._postings[gram].discard(equipment_id)
+
+    @staticmethod
+    def _make_entry(equipment, popularity):
+        normalized = normalize(equipment.name)
+        return {
+            'id': equipment.id,
+            'name': equipment.name,
+            'category': equipment.category,
+            'price': equipment.daily_price,
+            'image_url': equipment.image_url,
+            'boost_expires_at': equipment.boost_expires_at if equipment.is_boosted else None,
+            'popularity': popularity,
+            'normalized': normalized,
+            'words': normalized.split(),
+            'grams': trigrams(normalized)
+        }
+
+    def _ensure_fresh(self):
+        """Build the index on first use; afterwards refresh a stale one without blocking"""
+        if self._built_at is None:
+            with self._rebuild_lock:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        if time.monotonic() - self._built_at <= self.refresh_seconds:
+            return
+        if not self._rebuild_lock.acquire(blocking=False):
+            return  # Another request is already rebuilding it
+        from flask import current_app
+        try:
+            threading.Thread(
+                target=self._rebuild_in_background, args=(current_app._get_current_object(),),
+                name='autocomplete-rebuild', daemon=True
+            ).start()
+        except Exception:
+            self._rebuild_lock.release()
+            raise
+
+    def _rebuild_in_background(self, app):
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception as e:
+            logger.warning(f"⚠️  Autocomplete index rebuild failed, serving the previous one: {e}")
+        finally:
+            self._rebuild_lock.release()
+
+    # ---------- queries ----------
+
+    def suggest(self, query, limit=10):
+        """Return up to limit suggestion dicts for a partially typed query"""
+        self._ensure_fresh()
+
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        tokens = normalized.split()
+        # The last token is still being typed, so don't anchor it at a word end
+        query_grams = trigrams(' '.join(tokens[:-1])) | trigrams(tokens[-1], pad_end=False)
+
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                for equipment_id in self._postings.get(gram, ()):
+                    shared[equipment_id] += 1
+
+            now = datetime.utcnow()
+            max_popularity = math.log1p(self._max_popularity) or 1.0
+            scored = []
+            for equipment_id, count in shared.items():
+                entry = self._entries[equipment_id]
+                similarity = count / len(query_grams)
+                prefix_match = entry['normalized'].startswith(normalized) or all(
+                    any(word.startswith(token) for word in entry['words']) for token in tokens
+                )
+                if not prefix_match and similarity < MIN_SIMILARITY:
+                    # Typo tolerance: allow one edit against a word prefix of the same length
+                    if not all(
+                        len(token) >= 3 and any(within_one_edit(token, word[:len(token)]) for word in entry['words'])
+                        for token in tokens
+                    ):
+                        continue
+
+                boosted = entry['boost_expires_at'] is not None and entry['boost_expires_at'] > now
+                score = (
+                    similarity
+                    + (0.5 if prefix_match else 0)
+                    + (0.3 if boosted else 0)
+                    + 0.2 * math.log1p(entry['popularity']) / max_popularity
+                )
+                scored.append((score, entry))
+
+        scored.sort(key=lambda item: (-item[0], item[1]['name']))
+        return [
+            {
+                'type': 'equipment',
+                'id': entry['id'],
+                'name': entry['name'],
+                'category': entry['category'],
+                'price': entry['price'],
+                'image_url': entry['image_url']
+            }
+            for _, entry in scored[:limit]
+        ]
+
+
+# Shared per-process index used by the equipment routes
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,58 @@
+"""
+Cached booked-date ranges per equipment
+
+The calendar asks for the same listing's blocked dates on every render, so
+the merged ranges are cached in-process and dropped whenever a booking for
+that equipment is created or changes status. The TTL bounds how long another
+gunicorn worker can serve a stale calendar.
+"""
+from datetime import timedelta
+from src.models.user import db
+from src.models.booking import Booking, ACTIVE_BOOKING_STATUSES
+from src.utils.cache import TTLCache
+
+BLOCKED_DATES_CACHE_SECONDS = 60
+_blocked_ranges_cache = TTLCache(maxsize=2048, ttl=BLOCKED_DATES_CACHE_SECONDS)
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or back-to-back (start, end) date ranges; input must be sorted by start"""
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def get_blocked_ranges(equipment_id):
+    """Merged inclusive (start_date, end_date) ranges held by active bookings"""
+    ranges = _blocked_ranges_cache.get(equipment_id)
+    if ranges is None:
+        rows = db.session.query(Booking.start_date, Booking.end_date).filter(
+            Booking.equipment_id == equipment_id,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+        ).order_by(Booking.start_date).all()
+        ranges = merge_ranges(rows)
+        _blocked_ranges_cache.set(equipment_id, ranges)
+    return ranges
+
+
+def clip_ranges(ranges, window_start=None, window_end=None):
+    """Restrict ranges to the inclusive window, dropping ranges entirely outside it"""
+    clipped = []
+    for start, end in ranges:
+        if window_start and end < window_start:
+            continue
+        if window_end and start > window_end:
+            continue
+        clipped.append((max(start, window_start) if window_start else start,
+                        min(end, window_end) if window_end else end))
+    return clipped
+
+
+def invalidate_blocked_dates(equipment_id):
+    """Forget cached ranges after a booking for equipment_id was created or changed status"""
+    _blocked_ranges_cache.delete(equipment_id)
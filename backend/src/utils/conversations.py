@@ -0,0 +1,110 @@
+"""
+Conversation summary maintenance for the messages inbox
+
+send_message and the read endpoints keep `conversations` current in the same
+transaction as the message change, so GET /api/messages is a single indexed
+query over summaries rather than a scan of every message a user ever sent.
+"""
+from sqlalchemy import or_, case
+from src.models.user import db
+from src.models.message import Message, Conversation
+
+
+def _pair(user_a, user_b):
+    return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+
+def record_message(message):
+    """Upsert the message's conversation and bump the receiver's unread counter"""
+    low, high = _pair(message.sender_id, message.receiver_id)
+    receiver_is_low = message.receiver_id == low
+    values = {
+        'equipment_id': message.equipment_id,
+        'user_low_id': low,
+        'user_high_id': high,
+        'last_message_id': message.id,
+        'last_message': message.message,
+        'last_sender_id': message.sender_id,
+        'last_message_at': message.created_at,
+        'unread_low': 1 if receiver_is_low else 0,
+        'unread_high': 0 if receiver_is_low else 1
+    }
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(Conversation).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['equipment_id', 'user_low_id', 'user_high_id'],
+        set_={
+            'last_message_id': stmt.excluded.last_message_id,
+            'last_message': stmt.excluded.last_message,
+            'last_sender_id': stmt.excluded.last_sender_id,
+            'last_message_at': stmt.excluded.last_message_at,
+            'unread_low': Conversation.unread_low + stmt.excluded.unread_low,
+            'unread_high': Conversation.unread_high + stmt.excluded.unread_high
+        }
+    )
+    db.session.execute(stmt)
+
+
+def mark_conversations_read(user_id, equipment_id):
+    """Zero user_id's unread counters on every conversation about equipment_id"""
+    Conversation.query.filter(
+        Conversation.equipment_id == equipment_id,
+        Conversation.user_low_id == user_id
+    ).update({'unread_low': 0}, synchronize_session=False)
+    Conversation.query.filter(
+        Conversation.equipment_id == equipment_id,
+        Conversation.user_high_id == user_id
+    ).update({'unread_high': 0}, synchronize_session=False)
+
+
+def decrement_unread(message):
+    """A single message was read by its receiver"""
+    low, high = _pair(message.sender_id, message.receiver_id)
+    column = 'unread_low' if message.receiver_id == low else 'unread_high'
+    Conversation.query.filter_by(
+        equipment_id=message.equipment_id, user_low_id=low, user_high_id=high
+    ).update({column: case((getattr(Conversation, column) > 0, getattr(Conversation, column) - 1), else_=0)},
+             synchronize_session=False)
+
+
+def inbox_query(user_id):
+    """Conversations user_id takes part in"""
+    return Conversation.query.filter(
+        or_(Conversation.user_low_id == user_id, Conversation.user_high_id == user_id)
+    )
+
+
+def rebuild_conversations():
+    """Recompute every conversation summary from the messages table, returns the number of rows"""
+    Conversation.query.delete()
+    summaries = {}
+    messages = Message.query.order_by(Message.created_at.asc(), Message.id.asc()).yield_per(1000)
+    for message in messages:
+        low, high = _pair(message.sender_id, message.receiver_id)
+        key = (message.equipment_id, low, high)
+        summary = summaries.setdefault(key, {
+            'equipment_id': message.equipment_id,
+            'user_low_id': low,
+            'user_high_id': high,
+            'unread_low': 0,
+            'unread_high': 0
+        })
+        summary.update({
+            'last_message_id': message.id,
+            'last_message': message.message,
+            'last_sender_id': message.sender_id,
+            'last_message_at': message.created_at
+        })
+        if not message.is_read:
+            summary['unread_low' if message.receiver_id == low else 'unread_high'] += 1
+
+    if summaries:
+        db.session.execute(Conversation.__table__.insert(), list(summaries.values()))
+    db.session.commit()
+    return len(summaries)
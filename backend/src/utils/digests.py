@@ -0,0 +1,128 @@
+"""
+Hourly and daily message digest emails
+
+Users whose message_notification_mode is 'hourly' or 'daily' get no email
+per message. Instead send_due_digests() collects each due user's unread
+messages received since their last digest and queues one summary email
+through the outbox. It runs from the email outbox worker loop (or
+send_digests.py); users are claimed with a conditional update on
+last_message_digest_at, so concurrent workers never send the same digest.
+A batch's claims and its outbox rows are committed together: if queueing
+fails, the claims roll back and those users stay due.
+"""
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import or_, false
+from src.models.user import db, User
+from src.models.message import Message
+from src.models.equipment import Equipment
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_NOTIFICATION_MODES = ['instant', 'hourly', 'daily']
+DIGEST_INTERVALS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1)
+}
+# Users handled per query, keeps memory flat for large user bases
+DIGEST_BATCH_SIZE = 500
+PREVIEW_LENGTH = 160
+
+
+def wants_instant_message_email(user):
+    return (user.message_notification_mode or 'instant') == 'instant'
+
+
+def _claim_due_users(mode, now, limit):
+    """Users in mode whose digest is due, with their previous window start; the caller commits"""
+    due_before = now - DIGEST_INTERVALS[mode]
+    candidates = db.session.query(User.id, User.last_message_digest_at).filter(
+        User.message_notification_mode == mode,
+        or_(User.last_message_digest_at.is_(None), User.last_message_digest_at <= due_before)
+    ).order_by(User.id).limit(limit).all()
+
+    claimed = {}
+    for user_id, last_digest_at in candidates:
+        if last_digest_at is None:
+            condition = User.last_message_digest_at.is_(None)
+        else:
+            condition = User.last_message_digest_at == last_digest_at
+        updated = User.query.filter(User.id == user_id, condition).update(
+            {'last_message_digest_at': now}, synchronize_session=False
+        )
+        if updated:
+            claimed[user_id] = last_digest_at or (now - DIGEST_INTERVALS[mode])
+    return claimed
+
+
+def _collect_threads(claimed):
+    """Unread messages for claimed users grouped into threads, newest message last"""
+    oldest = min(claimed.values())
+    rows = db.session.query(Message, Equipment.name).join(
+        Equipment, Equipment.id == Message.equipment_id
+    ).filter(
+        Message.receiver_id.in_(claimed.keys()),
+        Message.is_read == false(),
+        Message.created_at > oldest
+    ).order_by(Message.receiver_id, Message.created_at, Message.id).all()
+
+    senders = {user.id: user for user in User.query.filter(
+        User.id.in_({message.sender_id for message, _ in rows})
+    ).all()} if rows else {}
+
+    threads = {}
+    for message, equipment_name in rows:
+        # Each user's own window; the shared query used the oldest one
+        if message.created_at <= claimed[message.receiver_id]:
+            continue
+        user_threads = threads.setdefault(message.receiver_id, OrderedDict())
+        sender = senders.get(message.sender_id)
+        thread = user_threads.setdefault((message.equipment_id, message.sender_id), {
+            'equipment_name': equipment_name,
+            'sender_name': f"{sender.first_name} {sender.last_name}" if sender else 'Someone',
+            'count': 0
+        })
+        thread['count'] += 1
+        thread['preview'] = message.message[:PREVIEW_LENGTH]
+    return threads
+
+
+def send_due_digests(mode, limit=DIGEST_BATCH_SIZE):
+    """
+    Queue digest emails for one batch of due users in mode.
+    Returns (users claimed, emails queued); users without unread messages
+    are claimed too, which just moves their window forward.
+    """
+    from src.utils.email_notifications import send_message_digest_email
+
+    try:
+        claimed = _claim_due_users(mode, datetime.utcnow(), limit)
+        if not claimed:
+            db.session.commit()
+            return 0, 0
+
+        threads = _collect_threads(claimed)
+        users = User.query.filter(User.id.in_(threads.keys())).all() if threads else []
+        for user in users:
+            if not send_message_digest_email(user, list(threads[user.id].values()), mode):
+                raise RuntimeError(f"Could not queue the {mode} digest for user {user.id}")
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(claimed), len(users)
+
+
+def run_due_digests():
+    """Send every digest that is due, for all modes, returns emails queued"""
+    sent = 0
+    for mode in DIGEST_INTERVALS:
+        while True:
+            claimed, queued = send_due_digests(mode)
+            sent += queued
+            if claimed < DIGEST_BATCH_SIZE:
+                break
+    if sent:
+        logger.info(f"✅ Queued {sent} message digests")
+    return sent
@@ -0,0 +1,156 @@
+"""
+Owner earnings rollup maintenance
+
+owner_daily_earnings is updated in the same transaction that moves a booking
+to 'completed', so dashboards can sum a few indexed rows instead of scanning
+every booking an owner ever had.
+
+complete_booking() claims the transition with a conditional UPDATE, so two
+concurrent completions of one booking add it only once. A session hook
+keeps the rollup in step with every other ORM change: a completed booking
+that is deleted (directly or by cascade) or moved to another status is
+subtracted again, and one set to 'completed' by plain assignment is added.
+"""
+from datetime import datetime
+from sqlalchemy import event, func, select, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from src.models.user import db
+from src.models.equipment import Equipment
+from src.models.booking import Booking
+from src.models.earnings import OwnerDailyEarnings
+
+OWNER_SHARE = 0.9  # Owners keep 90% after the 10% platform commission
+
+
+def _upsert(values, session=None):
+    """INSERT ... ON CONFLICT DO UPDATE adding values onto an existing rollup row"""
+    session = session or db.session
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(OwnerDailyEarnings).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['owner_id', 'equipment_id', 'day'],
+        set_={
+            'gross': OwnerDailyEarnings.gross + stmt.excluded.gross,
+            'net': OwnerDailyEarnings.net + stmt.excluded.net,
+            'bookings': OwnerDailyEarnings.bookings + stmt.excluded.bookings,
+            'updated_at': func.now()
+        }
+    )
+    session.execute(stmt)
+
+
+def _apply(booking, sign, session=None):
+    """Add (sign=1) or subtract (sign=-1) one completed booking's contribution"""
+    session = session or db.session
+    owner_id = booking.equipment.owner_id if booking.equipment is not None else session.execute(
+        select(Equipment.owner_id).where(Equipment.id == booking.equipment_id)
+    ).scalar()
+    day = (booking.created_at or booking.updated_at).date()
+    _upsert({
+        'owner_id': owner_id,
+        'equipment_id': booking.equipment_id,
+        'day': day,
+        'gross': sign * booking.total_cost,
+        'net': sign * booking.total_cost * OWNER_SHARE,
+        'bookings': sign
+    }, session)
+    if sign < 0:
+        session.execute(OwnerDailyEarnings.__table__.delete().where(
+            OwnerDailyEarnings.owner_id == owner_id,
+            OwnerDailyEarnings.equipment_id == booking.equipment_id,
+            OwnerDailyEarnings.day == day,
+            OwnerDailyEarnings.bookings <= 0
+        ))
+
+
+def complete_booking(booking):
+    """
+    Move booking to 'completed' and add it to the rollup, exactly once.
+    Returns False when another request completed it first. Call before the
+    caller's commit so both changes land together; on PostgreSQL the row
+    stays locked until then, so a concurrent completion waits and sees it.
+    """
+    claimed = Booking.query.filter(
+        Booking.id == booking.id,
+        Booking.status != 'completed'
+    ).update({'status': 'completed', 'updated_at': datetime.utcnow()}, synchronize_session=False)
+    if claimed != 1:
+        return False
+    # Already written by the UPDATE; mark it clean so the flush hook doesn't count it again
+    set_committed_value(booking, 'status', 'completed')
+    _apply(booking, 1)
+    return True
+
+
+def _committed_status(booking):
+    history = inspect(booking).attrs.status.history
+    committed = history.deleted or history.unchanged
+    return committed[0] if committed else None
+
+
+@event.listens_for(Booking.status, 'set', active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """active_history loads an expired status before it is overwritten, so the flush hook sees the old value"""
+
+
+@event.listens_for(Session, 'before_flush')
+def _sync_rollup(session, flush_context, instances):
+    for obj in list(session.deleted):
+        if isinstance(obj, Booking) and _committed_status(obj) == 'completed':
+            _apply(obj, -1, session)
+    for obj in list(session.dirty):
+        if not isinstance(obj, Booking):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        was_completed = bool(history.deleted) and history.deleted[0] == 'completed'
+        if was_completed and obj.status != 'completed':
+            _apply(obj, -1, session)
+        elif not was_completed and obj.status == 'completed':
+            _apply(obj, 1, session)
+
+
+def rollup_out_of_sync():
+    """True when the rollup's totals no longer match the completed bookings"""
+    rollup_count, rollup_gross = db.session.query(
+        func.coalesce(func.sum(OwnerDailyEarnings.bookings), 0),
+        func.coalesce(func.sum(OwnerDailyEarnings.gross), 0.0)
+    ).one()
+    actual_count, actual_gross = db.session.query(
+        func.count(Booking.id),
+        func.coalesce(func.sum(Booking.total_cost), 0.0)
+    ).filter(Booking.status == 'completed').one()
+    return rollup_count != actual_count or abs(rollup_gross - actual_gross) > 0.01
+
+
+def rebuild_owner_earnings():
+    """Recompute the whole rollup from completed bookings, returns the number of rows written"""
+    day = func.date(Booking.created_at)
+    source = select(
+        Equipment.owner_id,
+        Booking.equipment_id,
+        day,
+        func.sum(Booking.total_cost),
+        func.sum(Booking.total_cost) * OWNER_SHARE,
+        func.count(Booking.id)
+    ).join(
+        Equipment, Booking.equipment_id == Equipment.id
+    ).where(
+        Booking.status == 'completed'
+    ).group_by(Equipment.owner_id, Booking.equipment_id, day)
+
+    OwnerDailyEarnings.query.delete()
+    result = db.session.execute(
+        OwnerDailyEarnings.__table__.insert().from_select(
+            ['owner_id', 'equipment_id', 'day', 'gross', 'net', 'bookings'], source
+        )
+    )
+    db.session.commit()
+    return result.rowcount
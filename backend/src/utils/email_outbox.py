@@ -0,0 +1,158 @@
+"""
+Durable outbound email queue
+
+Request handlers only add rows to `email_outbox` (see send_email in
+email_notifications.py) in their own transaction, so an email is queued
+exactly when the change it announces is committed. A worker claims due rows in batches, delivers them
+concurrently and reschedules failures with exponential backoff, so SES
+latency and throttling never reach a user-facing request.
+
+The worker runs as a daemon thread in each web process started through
+wsgi.py (EMAIL_WORKER=thread, the default) or as a separate process with
+`python send_emails.py` (set EMAIL_WORKER=cli on the web service). Scripts
+that import the app never start it. The same loop queues message
+digests that are due (see digests.py). Claims are conditional updates,
+so any number of workers can share the table without double sending.
+"""
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.outbox import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '25'))
+SEND_THREADS = int(os.environ.get('EMAIL_SEND_THREADS', '4'))
+POLL_SECONDS = 5
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# A claimed row whose worker died becomes due again after this long
+LEASE_SECONDS = 300
+# How often the worker looks for hourly/daily message digests that are due
+DIGEST_CHECK_SECONDS = 60
+
+_wake = threading.Event()
+_worker = None
+
+
+def enqueue_email(to_email, subject, html_body, text_body=None, session=None):
+    """Add an email for delivery by the worker to session; it is queued when the caller commits"""
+    session = session or db.session
+    email = OutboundEmail(to_email=to_email, subject=subject, html_body=html_body, text_body=text_body)
+    session.add(email)
+    session.info['emails_queued'] = True
+    return email
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('emails_queued', False):
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_queued(session):
+    session.info.pop('emails_queued', None)
+
+
+def backoff_seconds(attempts):
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """Lease up to limit due emails to this worker"""
+    now = datetime.utcnow()
+    candidates = db.session.query(OutboundEmail.id, OutboundEmail.next_attempt_at).filter(
+        OutboundEmail.status.in_(['pending', 'sending']),
+        OutboundEmail.next_attempt_at <= now
+    ).order_by(OutboundEmail.id).limit(limit).all()
+
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    claimed = []
+    for email_id, next_attempt_at in candidates:
+        # Only one worker can move a row off the next_attempt_at value it read
+        updated = OutboundEmail.query.filter(
+            OutboundEmail.id == email_id,
+            OutboundEmail.next_attempt_at == next_attempt_at
+        ).update({'status': 'sending', 'next_attempt_at': lease}, synchronize_session=False)
+        if updated:
+            claimed.append(email_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return OutboundEmail.query.filter(OutboundEmail.id.in_(claimed)).order_by(OutboundEmail.id).all()
+
+
+def _deliver(email):
+    from src.utils.email_notifications import deliver_email
+    try:
+        deliver_email(email.to_email, email.subject, email.html_body, email.text_body)
+        return None
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+
+
+def process_outbox(limit=BATCH_SIZE):
+    """Deliver one batch of due emails, returns how many were attempted"""
+    batch = claim_batch(limit)
+    if not batch:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=SEND_THREADS) as pool:
+        errors = list(pool.map(_deliver, batch))
+
+    now = datetime.utcnow()
+    for email, error in zip(batch, errors):
+        email.attempts += 1
+        if error is None:
+            email.status = 'sent'
+            email.sent_at = now
+            email.last_error = None
+        elif email.attempts >= MAX_ATTEMPTS:
+            email.status = 'failed'
+            email.last_error = error
+            logger.warning(f"⚠️  Giving up on email {email.id} to {email.to_email}: {error}")
+        else:
+            email.status = 'pending'
+            email.next_attempt_at = now + timedelta(seconds=backoff_seconds(email.attempts))
+            email.last_error = error
+    db.session.commit()
+    return len(batch)
+
+
+def run_worker(app, stop_event=None):
+    """Process the outbox until stop_event is set, sleeping while it is empty"""
+    from src.utils.digests import run_due_digests
+    next_digest_check = 0
+    while stop_event is None or not stop_event.is_set():
+        try:
+            with app.app_context():
+                if time.monotonic() >= next_digest_check:
+                    next_digest_check = time.monotonic() + DIGEST_CHECK_SECONDS
+                    run_due_digests()
+                attempted = process_outbox()
+        except Exception as e:
+            logger.warning(f"⚠️  Email outbox worker error: {e}")
+            attempted = 0
+        if not attempted:
+            _wake.wait(POLL_SECONDS)
+            _wake.clear()
+
+
+def start_email_worker(app):
+    """Start the in-process worker thread unless EMAIL_WORKER says another process sends"""
+    global _worker
+    if os.environ.get('EMAIL_WORKER', 'thread') != 'thread':
+        return
+    if _worker is not None and _worker.is_alive():
+        return
+    _worker = threading.Thread(target=run_worker, args=(app,), name='email-outbox', daemon=True)
+    _worker.start()
@@ -0,0 +1,142 @@
+"""
+Per-user event fan-out for the /api/events/stream SSE endpoint
+
+Each open stream subscribes a queue for its user. publish() delivers an
+event to every queue of the given users. On PostgreSQL the event is sent
+with NOTIFY and every gunicorn worker runs one LISTEN thread that hands
+notifications to its own subscribers, so a message sent through worker A
+reaches a stream held open by worker B. Other databases deliver in-process
+only, which is enough for a single worker in development.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import text
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'wildshare_events'
+# Events queued for a stream that stops reading are dropped past this size
+QUEUE_SIZE = 100
+# NOTIFY payloads are capped at 8000 bytes, message previews are cut well below that
+PREVIEW_LENGTH = 200
+LISTEN_RECONNECT_SECONDS = 5
+
+
+class EventBroker:
+    """In-process pub/sub of per-user events, bridged across workers with LISTEN/NOTIFY"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._app = None
+        self._listener = None
+
+    def init_app(self, app):
+        self._app = app
+
+    # ---------- subscribers ----------
+
+    def subscribe(self, user_id):
+        """Return a queue that receives the user's events until unsubscribe()"""
+        subscription = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(subscription)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    # ---------- publishing ----------
+
+    def publish(self, user_ids, event, data):
+        """Send event with a JSON-serializable data dict to every stream of user_ids"""
+        payload = {'users': sorted(set(user_ids)), 'event': event, 'data': data}
+        if db.engine.dialect.name == 'postgresql':
+            try:
+                with db.engine.connect() as conn:
+                    conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                 {'channel': CHANNEL, 'payload': json.dumps(payload)})
+                    conn.commit()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️  Event NOTIFY failed, delivering locally only: {e}")
+        self._dispatch(payload)
+
+    def _dispatch(self, payload):
+        with self._lock:
+            targets = [q for user_id in payload['users'] for q in self._subscribers.get(user_id, ())]
+        for subscription in targets:
+            try:
+                subscription.put_nowait((payload['event'], payload['data']))
+            except queue.Full:
+                pass
+
+    # ---------- cross-worker listener ----------
+
+    def _ensure_listener(self):
+        if self._app is None or (self._listener is not None and self._listener.is_alive()):
+            return
+        with self._app.app_context():
+            if db.engine.dialect.name != 'postgresql':
+                return
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    raw = db.engine.raw_connection()
+                try:
+                    conn = raw.driver_connection
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {CHANNEL}")
+                    logger.info("✅ Listening for events")
+                    while True:
+                        if select.select([conn], [], [], 60) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            notification = conn.notifies.pop(0)
+                            self._dispatch(json.loads(notification.payload))
+                finally:
+                    raw.invalidate()
+            except Exception as e:
+                logger.warning(f"⚠️  Event listener disconnected, retrying: {e}")
+                time.sleep(LISTEN_RECONNECT_SECONDS)
+
+
+# Shared per-process broker used by the routes
+event_broker = EventBroker()
+
+
+def publish_new_message(message):
+    event_broker.publish([message.receiver_id], 'message', {
+        'id': message.id,
+        'equipment_id': message.equipment_id,
+        'sender_id': message.sender_id,
+        'message': message.message[:PREVIEW_LENGTH],
+        'created_at': message.created_at.isoformat() if message.created_at else None
+    })
+
+
+def publish_booking_status(booking, owner_id):
+    event_broker.publish([booking.renter_id, owner_id], 'booking_status', {
+        'booking_id': booking.id,
+        'equipment_id': booking.equipment_id,
+        'status': booking.status
+    })
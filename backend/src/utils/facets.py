@@ -0,0 +1,138 @@
+"""
+In-memory facet counts for the browse page filters
+
+A compact snapshot of every available listing (category, price, owner
+city/state) is loaded with one query and kept per process. Facet counts for
+any combination of applied filters are then computed from the snapshot
+without touching the database. The snapshot is rebuilt when the
+'equipment_filters' cache tag is invalidated by a write (see
+response_cache.py) or after REFRESH_SECONDS, whichever comes first.
+
+Counts are disjunctive: each facet applies every filter except its own, so
+picking a category still shows how many items the other categories have.
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from src.utils.response_cache import cache_backend
+
+REFRESH_SECONDS = 60
+FACET_TAG = 'equipment_filters'
+# Lower edges of the daily price histogram buckets; the last bucket is open ended
+PRICE_BUCKETS = [0, 25, 50, 100, 200, 500]
+
+
+class FacetIndex:
+    """Snapshot of available listings used to count facets for applied filters"""
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._rows = []
+        self._built_at = None
+        self._built_version = None
+
+    def rebuild(self):
+        from src.models.user import db, User
+        from src.models.equipment import Equipment
+
+        version = cache_backend.version(FACET_TAG)
+        rows = db.session.query(
+            Equipment.category, Equipment.daily_price, User.city, User.state
+        ).join(User, User.id == Equipment.owner_id).filter(Equipment.is_available == True).all()
+
+        with self._lock:
+            self._rows = [tuple(row) for row in rows]
+            self._built_at = time.monotonic()
+            self._built_version = version
+
+    def _is_stale(self):
+        return (self._built_at is None
+                or time.monotonic() - self._built_at > self.refresh_seconds
+                or cache_backend.version(FACET_TAG) != self._built_version)
+
+    def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+        # Single flight: concurrent requests wait for one rebuild instead of each running the query
+        with self._rebuild_lock:
+            if self._is_stale():
+                self.rebuild()
+
+    def counts(self, category=None, min_price=None, max_price=None, city=None, state=None):
+        """Facet counts and overall stats for listings matching the given filters"""
+        self._ensure_fresh()
+        with self._lock:
+            rows = self._rows
+
+        def matches(row, skip):
+            row_category, price, row_city, row_state = row
+            if 'category' not in skip and category and row_category != category:
+                return False
+            if 'price' not in skip:
+                if min_price is not None and (price is None or price < min_price):
+                    return False
+                if max_price is not None and (price is None or price > max_price):
+                    return False
+            if 'city' not in skip and city and (row_city or '').lower() != city.lower():
+                return False
+            if 'state' not in skip and state and (row_state or '').lower() != state.lower():
+                return False
+            return True
+
+        categories = Counter()
+        buckets = [0] * len(PRICE_BUCKETS)
+        cities = Counter()
+        states = Counter()
+        total = 0
+        for row in rows:
+            row_category, price, row_city, row_state = row
+            if row_category and matches(row, {'category'}):
+                categories[row_category] += 1
+            if price is not None and matches(row, {'price'}):
+                buckets[max(bisect.bisect_right(PRICE_BUCKETS, price) - 1, 0)] += 1
+            if row_city and row_state and matches(row, {'city'}):
+                cities[(row_city, row_state)] += 1
+            if row_state and matches(row, {'state'}):
+                states[row_state] += 1
+            if matches(row, set()):
+                total += 1
+
+        return {
+            'total': total,
+            'categories': [{'value': value, 'count': count} for value, count in sorted(categories.items())],
+            'price_histogram': [
+                {
+                    'min': PRICE_BUCKETS[i],
+                    'max': PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None,
+                    'count': buckets[i]
+                }
+                for i in range(len(PRICE_BUCKETS))
+            ],
+            'cities': [
+                {'city': city_name, 'state': state_name, 'count': count}
+                for (city_name, state_name), count in sorted(cities.items())
+            ],
+            'states': [{'value': value, 'count': count} for value, count in sorted(states.items())]
+        }
+
+    def summary(self):
+        """Unfiltered categories, price stats and locations"""
+        self._ensure_fresh()
+        with self._lock:
+            rows = self._rows
+        prices = [price for _, price, _, _ in rows if price is not None]
+        return {
+            'categories': sorted({row_category for row_category, _, _, _ in rows if row_category}),
+            'min_price': min(prices) if prices else None,
+            'max_price': max(prices) if prices else None,
+            'avg_price': sum(prices) / len(prices) if prices else None,
+            'cities': sorted({row_city for _, _, row_city, row_state in rows if row_city and row_state}),
+            'states': sorted({row_state for _, _, row_city, row_state in rows if row_city and row_state})
+        }
+
+
+# Shared per-process index used by the equipment routes
+facet_index = FacetIndex()
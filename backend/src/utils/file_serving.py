@@ -0,0 +1,88 @@
+"""
+Sending files from disk: cache policy and web server offload
+
+serve_file() wraps send_from_directory, which already answers conditional
+requests (ETag, Last-Modified, 304) and byte ranges (206). Files whose URL
+changes with their content are marked immutable for a year; everything else
+is revalidated with its ETag on each use instead of being re-downloaded.
+
+FILE_OFFLOAD hands the actual transfer to the web server in front of the app:
+
+    none        (default) Python streams the file
+    x-accel     nginx: X-Accel-Redirect to an internal location. Headers set
+                here are not reliably passed through the internal redirect,
+                so nginx sets the immutable policy itself, e.g.
+                    location /internal/uploads/ { internal; alias <uploads folder>/; }
+                    location /internal/assets/  { internal; alias <static>/assets/;
+                        add_header Cache-Control "public, max-age=31536000, immutable"; }
+                (uploads are immutable when content addressed: add the same
+                header in a location matching the 64 hex character names)
+    x-sendfile  Apache mod_xsendfile / lighttpd: X-Sendfile with the absolute path
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from flask import current_app, send_from_directory, abort
+from werkzeug.security import safe_join
+
+FILE_OFFLOAD = os.environ.get('FILE_OFFLOAD', 'none').lower()
+X_ACCEL_UPLOADS_PREFIX = os.environ.get('X_ACCEL_UPLOADS_PREFIX', '/internal/uploads/')
+X_ACCEL_ASSETS_PREFIX = os.environ.get('X_ACCEL_ASSETS_PREFIX', '/internal/assets/')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Build tools (Vite) put an 8 character base64url content hash in asset names:
+# index-BeK0CnoU.js. Requiring a digit or capital keeps plain hyphenated names
+# (site-manifest.json, logo-original.png) out; a rare all-lowercase hash is
+# just revalidated instead.
+FINGERPRINTED_ASSET = re.compile(r'-(?=[A-Za-z0-9_-]{0,7}[A-Z0-9])[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+_asset_hashes = {}
+
+
+def serve_file(directory, path, internal_prefix, immutable=False):
+    """Send directory/path with the cache policy above, offloaded per FILE_OFFLOAD"""
+    if FILE_OFFLOAD == 'x-accel':
+        full_path = safe_join(directory, path)
+        if full_path is None or not os.path.isfile(full_path):
+            abort(404)
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = internal_prefix.rstrip('/') + '/' + quote(path)
+        response.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if not immutable:
+            response.cache_control.no_cache = True
+        # Immutable files get their Cache-Control from nginx (see above)
+        return response
+
+    # x-sendfile is handled by Flask itself through USE_X_SENDFILE (see main.py)
+    response = send_from_directory(directory, path, max_age=IMMUTABLE_MAX_AGE if immutable else None)
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def asset_hash(directory, path):
+    """Short content hash of an asset, cached per (path, mtime)"""
+    full_path = safe_join(directory, path)
+    if full_path is None or not os.path.isfile(full_path):
+        return None
+    mtime = os.path.getmtime(full_path)
+    cached = _asset_hashes.get(full_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(full_path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    _asset_hashes[full_path] = (mtime, digest.hexdigest()[:12])
+    return _asset_hashes[full_path][1]
+
+
+def is_fingerprinted(path, version, directory):
+    """True when the URL pins the content: a hashed file name, or ?v= matching the current hash"""
+    if FINGERPRINTED_ASSET.search(path):
+        return True
+    return bool(version) and version == asset_hash(directory, path)
@@ -0,0 +1,232 @@
+"""
+Offline geocoding and radius search for equipment listings
+
+Listings get latitude/longitude from a gazetteer CSV
+(backend/data/us_places.csv: city,state[,zip],latitude,longitude). The
+bundled file only covers large cities; build_gazetteer.py replaces it with
+every Census place and ZIP code (run at build time), or point
+GAZETTEER_PATH at another file with the same columns.
+
+Request handlers and the startup backfill only use the gazetteer, so no
+request ever waits on the network. Every listing records when it was last
+geocoded, so startup tries each listing once. geocode_listings.py retries
+the listings left without coordinates, falling back to an online geocoder
+when GEOCODER=nominatim (GEOCODER_URL for a self-hosted instance), throttled
+to one request per second as the public Nominatim service requires.
+
+Radius queries first cut a bounding box on the indexed latitude/longitude
+columns, then filter and sort by an equirectangular distance that needs no
+trig functions in SQL, so it works the same on PostgreSQL and SQLite.
+Boxes are not split at the antimeridian: a radius reaching past longitude
+±180 misses points on the other side (irrelevant for US listings, except
+the western Aleutians).
+"""
+import csv
+import logging
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 1000
+
+DEFAULT_GAZETTEER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'us_places.csv')
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', DEFAULT_GAZETTEER)
+
+STATE_ABBREVIATIONS = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'district of columbia': 'DC',
+    'florida': 'FL', 'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL',
+    'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA',
+    'maine': 'ME', 'maryland': 'MD', 'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN',
+    'mississippi': 'MS', 'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV',
+    'new hampshire': 'NH', 'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
+    'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK', 'oregon': 'OR',
+    'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC', 'south dakota': 'SD',
+    'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT', 'virginia': 'VA',
+    'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY'
+}
+ZIP_PATTERN = re.compile(r'\b(\d{5})(?:-\d{4})?\b')
+
+GEOCODER = os.environ.get('GEOCODER', 'offline').lower()
+GEOCODER_URL = os.environ.get('GEOCODER_URL', 'https://nominatim.openstreetmap.org/search')
+GEOCODER_TIMEOUT = 5
+GEOCODER_MIN_INTERVAL = 1.0
+
+_places = None
+_zips = None
+_load_lock = threading.Lock()
+_online_lock = threading.Lock()
+_last_online_request = 0.0
+# Answers (including "no match") by query; failed requests aren't cached
+_online_cache = {}
+ONLINE_CACHE_SIZE = 1024
+
+
+def _normalize_city(city):
+    city = re.sub(r'\s+', ' ', (city or '').strip().lower())
+    return re.sub(r'^(saint|st\.?)\s', 'st ', city)
+
+
+def _normalize_state(state):
+    state = (state or '').strip()
+    return STATE_ABBREVIATIONS.get(state.lower(), state.upper())
+
+
+def _load():
+    global _places, _zips
+    with _load_lock:
+        if _places is not None:
+            return
+        places, zips = {}, {}
+        with open(GAZETTEER_PATH, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                point = (float(row['latitude']), float(row['longitude']))
+                if row.get('city') and row.get('state'):
+                    places.setdefault((_normalize_city(row['city']), _normalize_state(row['state'])), point)
+                if row.get('zip'):
+                    zips.setdefault(row['zip'].strip()[:5], point)
+        _places, _zips = places, zips
+
+
+def geocode(location=None, city=None, state=None, zip_code=None):
+    """
+    (latitude, longitude) for a free-text "City, ST[ ZIP]" location, falling
+    back to the given city/state and ZIP, or None when nothing matches.
+    """
+    if _places is None:
+        _load()
+
+    if location:
+        zip_match = ZIP_PATTERN.search(location)
+        if zip_match and zip_match.group(1) in _zips:
+            return _zips[zip_match.group(1)]
+        parts = [part.strip() for part in ZIP_PATTERN.sub('', location).split(',') if part.strip()]
+        # "123 Main St, Boulder, CO" -> try the last two parts as city, state
+        if len(parts) >= 2:
+            point = _places.get((_normalize_city(parts[-2]), _normalize_state(parts[-1])))
+            if point:
+                return point
+
+    if zip_code and zip_code.strip()[:5] in _zips:
+        return _zips[zip_code.strip()[:5]]
+    if city and state:
+        return _places.get((_normalize_city(city), _normalize_state(state)))
+    return None
+
+
+def geocode_online(query):
+    """(latitude, longitude) from the configured online geocoder, or None when it is off or fails"""
+    global _last_online_request
+    if GEOCODER != 'nominatim' or not query:
+        return None
+    import requests
+    with _online_lock:
+        if query in _online_cache:
+            return _online_cache[query]
+        wait = _last_online_request + GEOCODER_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_online_request = time.monotonic()
+        try:
+            response = requests.get(
+                GEOCODER_URL,
+                params={'q': query, 'format': 'json', 'countrycodes': 'us', 'limit': 1},
+                headers={'User-Agent': 'TheWildShare/1.0 (equipment listing geocoder)'},
+                timeout=GEOCODER_TIMEOUT
+            )
+            response.raise_for_status()
+            results = response.json()
+        except Exception as e:
+            logger.warning(f"⚠️  Online geocoding failed for {query!r}: {e}")
+            return None
+        point = (float(results[0]['lat']), float(results[0]['lon'])) if results else None
+        if len(_online_cache) >= ONLINE_CACHE_SIZE:
+            _online_cache.clear()
+        _online_cache[query] = point
+    return point
+
+
+def geocode_equipment(equipment, owner=None, online=False):
+    """
+    Set latitude/longitude from the listing's location or its owner's address.
+    online=True may block for seconds on the throttled geocoder: never from a request.
+    """
+    owner = owner or equipment.owner
+    city = owner.city if owner else None
+    state = owner.state if owner else None
+    zip_code = owner.zip_code if owner else None
+    point = geocode(location=equipment.location, city=city, state=state, zip_code=zip_code)
+    if point is None and online:
+        fallback = ', '.join(part for part in (city, state, zip_code) if part)
+        point = geocode_online(equipment.location) or geocode_online(fallback)
+    equipment.latitude, equipment.longitude = point if point else (None, None)
+    equipment.geocoded_at = datetime.utcnow()
+    return point
+
+
+def parse_near(value):
+    """Parse a near=lat,lon query value, raising ValueError when invalid"""
+    lat, lon = (float(part) for part in value.split(','))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('near is out of range')
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def apply_radius(query, latitude_column, longitude_column, lat, lon, radius_km):
+    """
+    Restrict query to points within radius_km of (lat, lon).
+    Returns (query, distance_order) where distance_order sorts nearest first.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    # Longitude degrees shrink towards the poles; clamp so the box stays finite
+    lon_scale = max(math.cos(math.radians(lat)), 0.01)
+    lon_delta = min(lat_delta / lon_scale, 180)
+
+    # Equirectangular squared distance in degrees of latitude; monotonic in true distance
+    d_lat = latitude_column - lat
+    d_lon = (longitude_column - lon) * lon_scale
+    distance_sq = d_lat * d_lat + d_lon * d_lon
+
+    query = query.filter(
+        latitude_column.between(lat - lat_delta, lat + lat_delta),
+        longitude_column.between(lon - lon_delta, lon + lon_delta),
+        distance_sq <= lat_delta * lat_delta
+    )
+    return query, distance_sq.asc()
+
+
+def backfill_equipment_coordinates(retry=False, online=False):
+    """
+    Geocode listings that were never attempted (retry=True: every listing
+    without coordinates, e.g. after installing a bigger gazetteer).
+    Offline by default so startup never waits on the online geocoder;
+    geocode_listings.py runs it with online=True.
+    Returns how many were located.
+    """
+    from src.models.user import db
+    from src.models.equipment import Equipment
+    from sqlalchemy.orm import selectinload
+
+    query = Equipment.query.options(selectinload(Equipment.owner)).filter(Equipment.latitude.is_(None))
+    if not retry:
+        query = query.filter(Equipment.geocoded_at.is_(None))
+    located = 0
+    for equipment in query.all():
+        if geocode_equipment(equipment, online=online):
+            located += 1
+    db.session.commit()
+    return located
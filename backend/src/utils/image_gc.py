@@ -0,0 +1,124 @@
+"""
+Reference counting and garbage collection for uploaded images
+
+An upload is referenced by every Equipment.image_url / image_urls entry and
+User.profile_image_url that points at it (or at one of its variants).
+Counts are taken from the database when collecting rather than maintained
+on every write, so edits made by any code path are always accounted for.
+
+Files with no references are deleted together with their variants, but only
+once they are older than GRACE_SECONDS: a fresh upload isn't attached to a
+listing or profile until the form is saved.
+"""
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from src.utils.images import (
+    UPLOAD_FOLDER, VARIANT_FOLDER, PENDING_FOLDER, UPLOAD_URL_PREFIX, SAVE_FORMATS, unpublish_upload
+)
+
+GRACE_SECONDS = 24 * 3600
+
+
+def reference_stem(url):
+    """Stem of the upload a URL points at (original or variant), or None for other URLs"""
+    if not url:
+        return None
+    # Absolute URLs to our own uploads count too
+    index = url.find(UPLOAD_URL_PREFIX)
+    if index == -1:
+        return None
+    parts = url[index + len(UPLOAD_URL_PREFIX):].split('?')[0].split('/')
+    if len(parts) == 3 and parts[0] == 'variants':
+        return parts[1]
+    if len(parts) == 1 and parts[0]:
+        return os.path.splitext(parts[0])[0]
+    return None
+
+
+def reference_counts():
+    """Counter of upload stem -> number of listings and profiles using it"""
+    from src.models.user import db, User
+    from src.models.equipment import Equipment
+
+    counts = Counter()
+    for image_url, image_urls in db.session.query(Equipment.image_url, Equipment.image_urls).yield_per(500):
+        urls = set()
+        if image_urls:
+            try:
+                urls.update(json.loads(image_urls))
+            except (TypeError, ValueError):
+                pass
+        urls.add(image_url)
+        counts.update({stem for stem in map(reference_stem, urls) if stem})
+
+    for (profile_image_url,) in db.session.query(User.profile_image_url).filter(User.profile_image_url.isnot(None)).yield_per(500):
+        stem = reference_stem(profile_image_url)
+        if stem:
+            counts[stem] += 1
+    return counts
+
+
+def _older_than(path, cutoff):
+    try:
+        return os.path.getmtime(path) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(grace_seconds=GRACE_SECONDS, dry_run=False):
+    """
+    Delete unreferenced originals and their variants, plus variant folders
+    and failure markers left without an original.
+    Returns {'originals': n, 'variant_folders': n, 'bytes': n}.
+    """
+    counts = reference_counts()
+    cutoff = time.time() - grace_seconds
+    removed = {'originals': 0, 'variant_folders': 0, 'bytes': 0}
+
+    def remove(path):
+        if os.path.isdir(path):
+            removed['bytes'] += sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            if not dry_run:
+                shutil.rmtree(path, ignore_errors=True)
+        else:
+            removed['bytes'] += os.path.getsize(path)
+            if not dry_run:
+                os.unlink(path)
+
+    originals, collected = set(), set()
+    for name in os.listdir(UPLOAD_FOLDER):
+        path = os.path.join(UPLOAD_FOLDER, name)
+        stem, extension = os.path.splitext(name)
+        if extension.lstrip('.').lower() not in SAVE_FORMATS or not os.path.isfile(path):
+            continue
+        if counts[stem] or not _older_than(path, cutoff):
+            originals.add(stem)
+            continue
+        remove(path)
+        if not dry_run:
+            unpublish_upload(name)
+        removed['originals'] += 1
+        collected.add(stem)
+        if os.path.isdir(os.path.join(VARIANT_FOLDER, stem)):
+            remove(os.path.join(VARIANT_FOLDER, stem))
+            removed['variant_folders'] += 1
+
+    pending = {os.path.splitext(name)[0] for name in os.listdir(PENDING_FOLDER)} if os.path.isdir(PENDING_FOLDER) else set()
+    if os.path.isdir(VARIANT_FOLDER):
+        for stem in os.listdir(VARIANT_FOLDER):
+            path = os.path.join(VARIANT_FOLDER, stem)
+            if stem in originals or stem in collected or stem in pending or counts[stem] or not _older_than(path, cutoff):
+                continue
+            remove(path)
+            removed['variant_folders'] += 1
+
+    if os.path.isdir(PENDING_FOLDER):
+        for name in os.listdir(PENDING_FOLDER):
+            path = os.path.join(PENDING_FOLDER, name)
+            if name.endswith('.failed') and _older_than(path, cutoff):
+                remove(path)
+
+    return removed
@@ -0,0 +1,424 @@
+"""
+Upload image pipeline: one decode, EXIF stripped, resized variants
+
+Every uploaded image is decoded once, rotated according to its EXIF
+orientation and re-encoded without metadata (GPS position, camera serials).
+From the same decoded image a fixed set of variants is written:
+
+    uploads/<stem>.<ext>                     original, metadata stripped
+    uploads/variants/<stem>/full.webp        max 1600px
+    uploads/variants/<stem>/card.webp        max 640px, listing grids
+    uploads/variants/<stem>/thumb.webp       max 200px
+    (+ .avif next to each when Pillow has AVIF support)
+
+Uploads are content addressed: the stem is the SHA-256 of the uploaded
+bytes, so the same photo attached to ten listings is stored (and
+processed) once, and every URL is immutable. Files that nothing references
+any more are removed by image_gc.py.
+
+Variant URLs are derived from the original URL, so Equipment.image_urls
+keeps storing plain original URLs and to_dict() can point at any size.
+The upload route serves the original when a variant doesn't exist (e.g.
+images uploaded before this pipeline), and picks AVIF for browsers that
+accept it.
+
+Decoding and encoding are CPU-bound, so the upload request only checks the
+image header and parks the raw bytes in uploads/pending/. IMAGE_WORKER picks
+who finishes the job:
+
+    pool    (default) a per-process ProcessPoolExecutor of IMAGE_WORKERS
+    cli     a separate `python process_images.py --watch` process
+    inline  in the request, as before
+
+Until then every URL of the image serves a placeholder, and
+image_status() / GET /api/upload/status report progress from the files on
+disk, so any web worker can answer.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.storage import get_storage
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow missing: uploads are stored as-is, variants fall back to the original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+if Image is None:
+    logger.error("❌ Pillow is not installed: uploads will be stored as-is, with EXIF/GPS metadata and no size variants")
+
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads'))
+VARIANT_FOLDER = os.path.join(UPLOAD_FOLDER, 'variants')
+PENDING_FOLDER = os.path.join(UPLOAD_FOLDER, 'pending')
+UPLOAD_URL_PREFIX = '/uploads/'
+CONTENT_STEM = re.compile(r'^[0-9a-f]{64}$')
+
+# Largest first: each variant is resized from the previous one, which is much cheaper than the original
+VARIANTS = [('full', 1600), ('card', 640), ('thumb', 200)]
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+JPEG_QUALITY = 90
+# Refuse decompression bombs well before they exhaust memory
+MAX_PIXELS = 40_000_000
+
+AVIF_ENABLED = Image is not None and features.check('avif') and os.environ.get('IMAGE_AVIF', 'true').lower() == 'true'
+SAVE_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'gif': 'GIF', 'webp': 'WEBP'}
+
+IMAGE_WORKER = os.environ.get('IMAGE_WORKER', 'pool')
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+
+# Served for every URL of an image that is still being processed
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="640" height="480" viewBox="0 0 640 480">'
+    '<rect width="640" height="480" fill="#e5e7eb"/>'
+    '<text x="320" y="248" font-family="sans-serif" font-size="24" fill="#6b7280" text-anchor="middle">Processing image…</text>'
+    '</svg>'
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+class InvalidImage(ValueError):
+    """Raised when uploaded bytes can't be decoded as a supported image"""
+
+
+def variant_path(stem, name, extension='webp'):
+    return os.path.join(VARIANT_FOLDER, stem, f"{name}.{extension}")
+
+
+def pending_path(filename):
+    return os.path.join(PENDING_FOLDER, filename)
+
+
+def _find_stem(folder, stem):
+    """Filename of the upload with this stem in folder, whatever its extension"""
+    for extension in SAVE_FORMATS:
+        if os.path.isfile(os.path.join(folder, f"{stem}.{extension}")):
+            return f"{stem}.{extension}"
+    return None
+
+
+def _write_atomic(path, data):
+    """Write to a temp file and rename, so readers never see a half-written image"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def content_filename(sha256, extension):
+    """Filename for uploaded content: the existing upload with the same hash, whatever its extension, or <sha256>.<extension>"""
+    return _find_stem(UPLOAD_FOLDER, sha256) or _find_stem(PENDING_FOLDER, sha256) or f"{sha256}.{extension}"
+
+
+def is_content_addressed(path):
+    """True for originals and variants named by content hash, whose bytes never change"""
+    parts = path.split('/')
+    stem = parts[1] if len(parts) == 3 and parts[0] == 'variants' else os.path.splitext(parts[-1])[0]
+    return bool(CONTENT_STEM.match(stem))
+
+
+def _already_stored(filename):
+    """Skip storing content we already have; touch it so a pending GC keeps it"""
+    for path in (os.path.join(UPLOAD_FOLDER, filename), pending_path(filename)):
+        if os.path.isfile(path):
+            os.utime(path)
+            return True
+    return False
+
+
+def variant_urls(image_url):
+    """thumb/card/full URLs for an uploaded image URL, or None for external images"""
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX) or '/variants/' in image_url:
+        return None
+    stem = os.path.splitext(image_url[len(UPLOAD_URL_PREFIX):])[0]
+    urls = {name: f"{UPLOAD_URL_PREFIX}variants/{stem}/{name}.webp" for name, _ in VARIANTS}
+    urls['original'] = image_url
+    return urls
+
+
+def check_image(data):
+    """Cheap validation from the image header only, without decoding pixels. data may be bytes or a path"""
+    if Image is None:
+        raise InvalidImage('Image processing is not available')
+    try:
+        with Image.open(io.BytesIO(data) if isinstance(data, bytes) else data) as image:
+            width, height = image.size
+    except Exception:
+        raise InvalidImage('File is not a valid image')
+    if width * height > MAX_PIXELS:
+        raise InvalidImage('Image dimensions are too large')
+
+
+def decode(data):
+    """Decode uploaded bytes once, applying and then dropping EXIF orientation"""
+    if Image is None:
+        raise InvalidImage('Image processing is not available')
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Image.DecompressionBombError:
+        raise InvalidImage('Image dimensions are too large')
+    except Exception:
+        raise InvalidImage('File is not a valid image')
+    return ImageOps.exif_transpose(image)
+
+
+def _encode_original(image, extension):
+    """Re-encode without EXIF/XMP/ICC extras, keeping the upload's format"""
+    save_format = SAVE_FORMATS.get(extension, 'JPEG')
+    output = io.BytesIO()
+    if save_format == 'JPEG':
+        image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    elif save_format == 'WEBP':
+        image.save(output, 'WEBP', quality=WEBP_QUALITY)
+    else:
+        image.save(output, save_format)
+    return output.getvalue()
+
+
+def _encode(image, save_format, **options):
+    output = io.BytesIO()
+    image.save(output, save_format, **options)
+    return output.getvalue()
+
+
+def write_variants(image, stem):
+    """Write every size variant of a decoded image"""
+    current = image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    for name, max_size in VARIANTS:
+        current = current.copy()
+        current.thumbnail((max_size, max_size), Image.LANCZOS)
+        _write_atomic(variant_path(stem, name), _encode(current, 'WEBP', quality=WEBP_QUALITY, method=4))
+        if AVIF_ENABLED:
+            _write_atomic(variant_path(stem, name, 'avif'), _encode(current, 'AVIF', quality=AVIF_QUALITY))
+
+
+def process_image(filename):
+    """
+    Finish an upload: decode the pending bytes (or, for a backfill, the
+    stored original), write the variants and the metadata-free original.
+    Runs in the process pool, so it only touches files. Returns the status.
+    """
+    stem, extension = os.path.splitext(filename)
+    source = pending_path(filename)
+    is_pending = os.path.isfile(source)
+    if not is_pending:
+        source = os.path.join(UPLOAD_FOLDER, filename)
+    with open(source, 'rb') as f:
+        data = f.read()
+
+    try:
+        image = decode(data)
+    except InvalidImage as e:
+        if is_pending:
+            _write_atomic(source + '.failed', str(e).encode())
+            _discard(source)
+        return 'failed'
+
+    write_variants(image, stem)
+    # Existing originals are only re-encoded (losing quality) when they still carry metadata
+    if is_pending or image.getexif() or 'exif' in image.info or 'xmp' in image.info:
+        _write_atomic(os.path.join(UPLOAD_FOLDER, filename), _encode_original(image, extension.lstrip('.').lower()))
+    publish_upload(filename)
+    if is_pending:
+        _discard(source)
+        _discard(source + '.failed')
+    return 'ready'
+
+
+def upload_keys(filename):
+    """Storage keys of an upload: the original and every variant file"""
+    stem = os.path.splitext(filename)[0]
+    extensions = ('webp', 'avif') if AVIF_ENABLED else ('webp',)
+    return [filename] + [f"variants/{stem}/{name}.{extension}" for name, _ in VARIANTS for extension in extensions]
+
+
+def publish_upload(filename):
+    """Copy a processed upload to a remote storage backend (nothing to do for local storage)"""
+    storage = get_storage()
+    if not storage.remote:
+        return
+    immutable = is_content_addressed(filename)
+    for key in upload_keys(filename):
+        path = os.path.join(UPLOAD_FOLDER, key)
+        if os.path.isfile(path):
+            storage.publish(key, path, immutable=immutable)
+
+
+def unpublish_upload(filename):
+    storage = get_storage()
+    if storage.remote:
+        for key in upload_keys(filename):
+            storage.delete(key)
+
+
+def _discard(path):
+    # A backfill and the pool may finish the same upload; either may remove it first
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded web worker can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _log_failure(filename):
+    def callback(future):
+        error = future.exception()
+        if error is not None:
+            logger.warning(f"⚠️  Image processing failed for {filename}: {error}")
+    return callback
+
+
+def submit_image(filename):
+    """Hand a pending upload to the process pool"""
+    future = _get_pool().submit(process_image, filename)
+    future.add_done_callback(_log_failure(filename))
+    return future
+
+
+def store_image(data, filename):
+    """
+    Accept an uploaded image under filename. The header is validated here;
+    decoding, metadata stripping and variants happen per IMAGE_WORKER.
+    Without Pillow the bytes are saved unchanged.
+    Returns the variant URLs, which serve a placeholder until processed.
+    """
+    if _already_stored(filename):
+        return variant_urls(UPLOAD_URL_PREFIX + filename)
+    if Image is None:
+        logger.error(f"❌ Storing {filename} without stripping metadata: Pillow is not installed")
+        _write_atomic(os.path.join(UPLOAD_FOLDER, filename), data)
+        publish_upload(filename)
+        return variant_urls(UPLOAD_URL_PREFIX + filename)
+
+    check_image(data)
+    _write_atomic(pending_path(filename), data)
+    _schedule(filename)
+    return variant_urls(UPLOAD_URL_PREFIX + filename)
+
+
+def store_image_file(path, filename):
+    """store_image for bytes already on disk (streamed uploads): the file is moved, never read into memory"""
+    if _already_stored(filename):
+        os.unlink(path)
+        return variant_urls(UPLOAD_URL_PREFIX + filename)
+    if Image is None:
+        logger.error(f"❌ Storing {filename} without stripping metadata: Pillow is not installed")
+        os.replace(path, os.path.join(UPLOAD_FOLDER, filename))
+        publish_upload(filename)
+        return variant_urls(UPLOAD_URL_PREFIX + filename)
+
+    check_image(path)
+    os.makedirs(PENDING_FOLDER, exist_ok=True)
+    os.replace(path, pending_path(filename))
+    _schedule(filename)
+    return variant_urls(UPLOAD_URL_PREFIX + filename)
+
+
+def _schedule(filename):
+    if IMAGE_WORKER == 'inline':
+        process_image(filename)
+    elif IMAGE_WORKER == 'pool':
+        submit_image(filename)
+
+
+def image_status(image_url):
+    """
+    'pending', 'ready', 'failed' (with error) or 'missing' for an upload URL.
+    'original' means the file exists but its variants were never generated.
+    """
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX) or '/' in image_url[len(UPLOAD_URL_PREFIX):]:
+        return {'status': 'missing'}
+    filename = image_url[len(UPLOAD_URL_PREFIX):]
+    stem = os.path.splitext(filename)[0]
+
+    if os.path.isfile(pending_path(filename)):
+        return {'status': 'pending'}
+    if os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+        if all(os.path.isfile(variant_path(stem, name)) for name, _ in VARIANTS):
+            return {'status': 'ready', 'variants': variant_urls(image_url)}
+        return {'status': 'original'}
+    if os.path.isfile(pending_path(filename) + '.failed'):
+        with open(pending_path(filename) + '.failed') as f:
+            return {'status': 'failed', 'error': f.read()}
+    return {'status': 'missing'}
+
+
+def pending_uploads():
+    """Filenames of uploads waiting to be processed"""
+    if not os.path.isdir(PENDING_FOLDER):
+        return []
+    return [name for name in sorted(os.listdir(PENDING_FOLDER)) if os.path.splitext(name)[1].lstrip('.') in SAVE_FORMATS]
+
+
+def backfill_targets(force=False):
+    """Filenames that need processing: every pending upload, plus originals without variants"""
+    targets = pending_uploads()
+    pending = set(targets)
+    for name in sorted(os.listdir(UPLOAD_FOLDER)):
+        stem, extension = os.path.splitext(name)
+        if extension.lstrip('.').lower() not in SAVE_FORMATS or name in pending:
+            continue
+        if not os.path.isfile(os.path.join(UPLOAD_FOLDER, name)):
+            continue
+        if force or not all(os.path.isfile(variant_path(stem, variant)) for variant, _ in VARIANTS):
+            targets.append(name)
+    return targets
+
+
+def resolve_upload(filename, accept=''):
+    """
+    Map a requested /uploads/ path to the file to send: AVIF instead of WebP
+    when the browser accepts it, and the original when a variant is missing.
+    Returns (path relative to UPLOAD_FOLDER, negotiated) or None.
+    """
+    # Originals live at the top level; pending/ and incoming/ hold unprocessed bytes and are never served
+    if '/' not in filename and os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+        return filename, False
+
+    parts = filename.split('/')
+    if len(parts) != 3 or parts[0] != 'variants':
+        return None
+    stem, variant = parts[1], parts[2]
+    name = os.path.splitext(variant)[0]
+    if AVIF_ENABLED and 'image/avif' in accept and os.path.isfile(variant_path(stem, name, 'avif')):
+        return f"variants/{stem}/{name}.avif", True
+    if os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+        return filename, AVIF_ENABLED
+
+    # Not generated (yet): fall back to the original upload
+    original = _find_stem(UPLOAD_FOLDER, stem)
+    return (original, False) if original else None
+
+
+def is_pending(filename):
+    """True when filename (an original or variant path) belongs to an upload still being processed"""
+    parts = filename.split('/')
+    if len(parts) == 3 and parts[0] == 'variants':
+        return _find_stem(PENDING_FOLDER, parts[1]) is not None
+    return len(parts) == 1 and os.path.isfile(pending_path(filename))
@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination helpers
+
+Pages are fetched with `WHERE (sort_key, id) < (last_sort_key, last_id)`
+instead of OFFSET, so page 500 costs the same as page 1. Cursors are opaque
+url-safe tokens; clients pass back `next_cursor` unchanged.
+
+Orderings without a stable sort key (search relevance, distance) page by
+offset instead; their cursors are tagged as offset cursors, so a cursor of
+one kind is rejected where the other is expected.
+"""
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+from src.utils.cache import TTLCache
+
+# Exact COUNT(*) results are reused for this long, so total_count is an estimate
+COUNT_CACHE_SECONDS = 60
+_count_cache = TTLCache(maxsize=512, ttl=COUNT_CACHE_SECONDS)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token is malformed or belongs to another sort order"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(sort_name, values):
+    """Build an opaque cursor for the row with the given sort key values"""
+    payload = json.dumps({'s': sort_name, 'v': [_encode_value(v) for v in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def encode_offset_cursor(sort_name, offset):
+    """Cursor for orderings paged by offset"""
+    payload = json.dumps({'s': sort_name, 'o': offset}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_payload(sort_name, token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(payload, dict):
+        raise InvalidCursor('Invalid cursor')
+    if payload.get('s') != sort_name:
+        raise InvalidCursor('Cursor does not match the requested sort order')
+    return payload
+
+
+def decode_cursor(sort_name, token, length=None):
+    """Return the sort key values stored in a cursor, validating its sort order and number of keys"""
+    payload = _decode_payload(sort_name, token)
+    try:
+        values = [_decode_value(v) for v in payload['v']]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if length is not None and len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def decode_offset_cursor(sort_name, token):
+    """Return the offset stored in an offset cursor"""
+    offset = _decode_payload(sort_name, token).get('o')
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise InvalidCursor('Invalid cursor')
+    return offset
+
+
+def cursor_for(row, order, sort_name):
+    """Keyset cursor pointing just after row"""
+    return encode_cursor(sort_name, [getattr(row, column.key) for column, _ in order])
+
+
+def _after(order, values):
+    """WHERE clause selecting rows strictly after values in the given ordering"""
+    conditions = []
+    for i, (column, direction) in enumerate(order):
+        beyond = column > values[i] if direction == 'asc' else column < values[i]
+        ties = [order[j][0] == values[j] for j in range(i)]
+        conditions.append(and_(*ties, beyond))
+    return or_(*conditions)
+
+
+def keyset_page(query, order, sort_name, cursor=None, limit=50):
+    """
+    Fetch one page of query ordered by order.
+
+    order is a list of (column, 'asc'|'desc') whose last column is unique
+    (normally the primary key). Returns (items, next_cursor); next_cursor is
+    None on the last page.
+    """
+    if cursor:
+        query = query.filter(_after(order, decode_cursor(sort_name, cursor, len(order))))
+    query = query.order_by(*[column.asc() if direction == 'asc' else column.desc() for column, direction in order])
+
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = cursor_for(items[-1], order, sort_name) if len(rows) > limit else None
+    return items, next_cursor
+
+
+def cached_count(query, cache_key):
+    """COUNT(*) for query, cached for COUNT_CACHE_SECONDS under cache_key"""
+    count = _count_cache.get(cache_key)
+    if count is None:
+        count = query.order_by(None).count()
+        _count_cache.set(cache_key, count)
+    return count
+
+
+def count_cache_key(prefix, args):
+    """Cache key for a listing's total, ignoring the paging parameters"""
+    filters = sorted((k, v) for k, v in args.items(multi=True) if k not in ('cursor', 'limit', 'offset', 'page', 'per_page', 'include_total'))
+    return f"{prefix}:{json.dumps(filters)}"
@@ -0,0 +1,145 @@
+"""
+Cache-aside layer for public, read-heavy GET endpoints
+
+@cached_response stores the rendered JSON body and its ETag under a key made
+of a tag, the tag's current version and the query string. Write paths call
+invalidate(tag), which bumps the version so every cached variant of that
+tag is skipped from then on and ages out on its own.
+
+The store is picked by CACHE_URL: unset or memory:// keeps a per-process LRU
+with TTL, redis://... shares one cache (and the versions) across all
+gunicorn workers. With the in-process store, invalidation only reaches the
+worker that handled the write; other workers catch up within the TTL.
+"""
+import os
+import json
+import hashlib
+import logging
+from functools import wraps
+from flask import request, current_app, make_response
+from src.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.environ.get('CACHE_URL', 'memory://')
+KEY_PREFIX = 'wildshare:'
+
+
+class MemoryBackend:
+    """Per-process store built on TTLCache"""
+
+    def __init__(self, maxsize=2048):
+        self._entries = TTLCache(maxsize=maxsize)
+        # One small int per tag ever invalidated; never evicted so a version can't go backwards
+        self._versions = {}
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl):
+        self._entries.set(key, value, ttl=ttl)
+
+    def version(self, tag):
+        return self._versions.get(tag, 0)
+
+    def bump(self, tag):
+        self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+
+
+class RedisBackend:
+    """Store shared by every worker in a Redis-compatible server"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key):
+        try:
+            return self._client.get(KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"⚠️  Cache get failed: {e}")
+            return None
+
+    def set(self, key, value, ttl):
+        try:
+            self._client.set(KEY_PREFIX + key, value, ex=ttl)
+        except Exception as e:
+            logger.warning(f"⚠️  Cache set failed: {e}")
+
+    def version(self, tag):
+        try:
+            return int(self._client.get(f"{KEY_PREFIX}v:{tag}") or 0)
+        except Exception:
+            # Unknown version: use a key nothing was stored under, i.e. a miss
+            return 'unavailable'
+
+    def bump(self, tag):
+        try:
+            self._client.incr(f"{KEY_PREFIX}v:{tag}")
+        except Exception as e:
+            logger.warning(f"⚠️  Cache invalidation failed for {tag}: {e}")
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{KEY_PREFIX}*"):
+            self._client.delete(key)
+
+
+def _make_backend(url):
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            return RedisBackend(url)
+        except ImportError:
+            logger.warning("⚠️  CACHE_URL points at Redis but the redis package is not installed, using in-process cache")
+    return MemoryBackend()
+
+
+cache_backend = _make_backend(CACHE_URL)
+
+
+def invalidate(*tags):
+    """Drop every cached response stored under any of tags"""
+    for tag in tags:
+        cache_backend.bump(tag)
+
+
+def invalidate_equipment(equipment_id):
+    """A listing changed: its detail page, its reviews and the filter options"""
+    invalidate(f"equipment:{equipment_id}", f"equipment_reviews:{equipment_id}", 'equipment_filters')
+
+
+def cached_response(tag, ttl=60, max_age=None):
+    """
+    Serve a public GET view from the cache. tag may use the view's URL
+    arguments, e.g. 'equipment:{equipment_id}'. Only 200 responses are
+    stored. max_age (defaults to ttl) is what browsers and CDNs are told.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            resolved_tag = tag.format(**kwargs)
+            key = f"resp:{resolved_tag}:{cache_backend.version(resolved_tag)}:{request.query_string.decode()}"
+
+            cached = cache_backend.get(key)
+            if cached is not None:
+                entry = json.loads(cached)
+                status = 'HIT'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data(as_text=True)
+                entry = {'body': body, 'etag': hashlib.md5(body.encode()).hexdigest()}
+                cache_backend.set(key, json.dumps(entry), ttl)
+                status = 'MISS'
+
+            response = current_app.response_class(entry['body'], mimetype='application/json')
+            response.set_etag(entry['etag'])
+            response.headers['Cache-Control'] = f"public, max-age={max_age if max_age is not None else ttl}"
+            response.headers['X-Cache'] = status
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,132 @@
+"""
+Full-text search for equipment listings
+
+PostgreSQL: a generated `search_vector` tsvector column with a GIN index.
+SQLite: an external-content FTS5 table kept in sync by triggers.
+Both are maintained by the database itself, so creates, updates and deletes
+never need to touch the index from Python.
+"""
+import re
+import logging
+from sqlalchemy import text, literal_column, func, or_, Float, Integer
+from src.models.equipment import Equipment
+
+logger = logging.getLogger(__name__)
+
+# Per-process record of which backend is usable; set by ensure_search_index()
+_search_backend = None
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+POSTGRES_SEARCH_COLUMN = """
+    ALTER TABLE equipment ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(capacity_spec, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+"""
+
+POSTGRES_SEARCH_INDEX = "CREATE INDEX IF NOT EXISTS idx_equipment_search_vector ON equipment USING GIN (search_vector)"
+
+SQLITE_FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS equipment_fts USING fts5(
+        name, description, capacity_spec, category,
+        content='equipment', content_rowid='id', tokenize='porter unicode61'
+    )
+"""
+
+SQLITE_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS equipment_fts_ai AFTER INSERT ON equipment BEGIN
+        INSERT INTO equipment_fts(rowid, name, description, capacity_spec, category)
+        VALUES (new.id, new.name, new.description, new.capacity_spec, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS equipment_fts_ad AFTER DELETE ON equipment BEGIN
+        INSERT INTO equipment_fts(equipment_fts, rowid, name, description, capacity_spec, category)
+        VALUES ('delete', old.id, old.name, old.description, old.capacity_spec, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS equipment_fts_au AFTER UPDATE ON equipment BEGIN
+        INSERT INTO equipment_fts(equipment_fts, rowid, name, description, capacity_spec, category)
+        VALUES ('delete', old.id, old.name, old.description, old.capacity_spec, old.category);
+        INSERT INTO equipment_fts(rowid, name, description, capacity_spec, category)
+        VALUES (new.id, new.name, new.description, new.capacity_spec, new.category);
+    END
+    """
+]
+
+
+def ensure_search_index(engine):
+    """Create the search column/table, index and sync triggers if missing"""
+    global _search_backend
+
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text(POSTGRES_SEARCH_COLUMN))
+            conn.execute(text(POSTGRES_SEARCH_INDEX))
+            conn.commit()
+            _search_backend = 'postgresql'
+        elif engine.dialect.name == 'sqlite':
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='equipment_fts'"
+            )).first() is not None
+            conn.execute(text(SQLITE_FTS_TABLE))
+            for trigger in SQLITE_FTS_TRIGGERS:
+                conn.execute(text(trigger))
+            if not existed:
+                # Index rows that were created before the FTS table existed
+                conn.execute(text("INSERT INTO equipment_fts(equipment_fts) VALUES ('rebuild')"))
+            conn.commit()
+            _search_backend = 'sqlite'
+
+    logger.info(f"✅ Equipment search index ready ({_search_backend})")
+
+
+def tokenize(search_term):
+    """Split a raw search string into lowercase word tokens"""
+    return [token.lower() for token in TOKEN_PATTERN.findall(search_term)]
+
+
+def apply_search(query, search_term):
+    """
+    Restrict an Equipment query to rows matching search_term.
+
+    Returns (query, rank_order) where rank_order is an ORDER BY clause that
+    sorts best matches first. Every token is prefix-matched so partially typed
+    words still match. Falls back to ILIKE when no search index is available.
+    """
+    tokens = tokenize(search_term)
+    if not tokens:
+        return query, None
+
+    if _search_backend == 'postgresql':
+        ts_query = func.to_tsquery('english', ' & '.join(f"{token}:*" for token in tokens))
+        search_vector = literal_column('equipment.search_vector')
+        query = query.filter(search_vector.op('@@')(ts_query))
+        return query, func.ts_rank(search_vector, ts_query).desc()
+
+    if _search_backend == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        # bm25 weights: name, description, capacity_spec, category (lower score = better)
+        matches = text(
+            "SELECT rowid AS equipment_id, bm25(equipment_fts, 10.0, 1.0, 4.0, 4.0) AS rank "
+            "FROM equipment_fts WHERE equipment_fts MATCH :match"
+        ).bindparams(match=match).columns(equipment_id=Integer, rank=Float).subquery('search_matches')
+        query = query.join(matches, matches.c.equipment_id == Equipment.id)
+        return query, matches.c.rank.asc()
+
+    search_pattern = f"%{search_term}%"
+    query = query.filter(
+        or_(
+            Equipment.name.ilike(search_pattern),
+            Equipment.description.ilike(search_pattern),
+            Equipment.capacity_spec.ilike(search_pattern),
+            Equipment.category.ilike(search_pattern)
+        )
+    )
+    return query, None
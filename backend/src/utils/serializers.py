@@ -0,0 +1,57 @@
+"""
+Set-based serializers for list endpoints
+
+Model to_dict() methods follow lazy relationships one row at a time, which
+turns a 50 item page into 50+ extra SELECTs. These helpers load every
+related row a page needs up front, in one IN query per relationship, and then
+call the normal to_dict() so the JSON shape stays identical. Relationships
+already loaded (e.g. with selectinload) are not queried again.
+"""
+from sqlalchemy import inspect
+from src.models.user import User
+from src.models.equipment import Equipment
+
+
+def _unloaded(items, attribute):
+    """Items whose relationship attribute has not been loaded yet"""
+    return [item for item in items if attribute in inspect(item).unloaded]
+
+
+def preload_users(user_ids):
+    """Load users into the session identity map so lazy many-to-one loads become cache hits"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return []
+    return User.query.filter(User.id.in_(user_ids)).all()
+
+
+def serialize_equipment_list(items, include_full_owner=False):
+    """Serialize equipment, fetching all owners for the page in a single query"""
+    # Keep a reference so the identity map doesn't drop the owners before to_dict() runs
+    owners = preload_users(item.owner_id for item in _unloaded(items, 'owner'))
+    return [item.to_dict(include_full_owner=include_full_owner) for item in items]
+
+
+def parse_fields(value):
+    """Turn a ?fields=a,b,c query value into a set, or None for all fields"""
+    if not value:
+        return None
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+def serialize_bookings(bookings, fields=None):
+    """
+    Serialize bookings with a constant number of queries: one for their
+    equipment, one for the equipment owners and one for the renters.
+    Nested objects left out of fields are never loaded.
+    """
+    loaded = []
+    if fields is None or 'equipment' in fields:
+        missing_ids = {booking.equipment_id for booking in _unloaded(bookings, 'equipment')}
+        if missing_ids:
+            loaded += Equipment.query.filter(Equipment.id.in_(missing_ids)).all()
+        equipment = [booking.equipment for booking in bookings if booking.equipment is not None]
+        loaded += preload_users(item.owner_id for item in _unloaded(equipment, 'owner'))
+    if fields is None or 'renter' in fields:
+        loaded += preload_users(booking.renter_id for booking in _unloaded(bookings, 'renter'))
+    return [booking.to_dict(fields=fields) for booking in bookings]
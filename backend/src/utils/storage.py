@@ -0,0 +1,105 @@
+"""
+Where finished uploads live
+
+The image pipeline always works on the local uploads folder (pending bytes,
+variant encoding). Once an image is processed its files are published to
+the storage backend picked by STORAGE_BACKEND:
+
+    local   (default) the uploads folder itself; /uploads/ serves it, or
+            nginx does with FILE_OFFLOAD=x-accel (see file_serving.py)
+    s3      an S3 (or S3-compatible) bucket: S3_BUCKET, optional S3_PREFIX,
+            S3_ENDPOINT_URL, and STORAGE_PUBLIC_URL for a CDN in front of
+            the bucket; without it /uploads/ redirects to presigned URLs
+
+With a remote backend /uploads/ answers with a redirect, so image bytes
+never pass through the app server.
+"""
+import logging
+import mimetypes
+import os
+from src.utils.file_serving import IMMUTABLE_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local').lower()
+PRESIGNED_URL_SECONDS = int(os.environ.get('STORAGE_URL_EXPIRES', '3600'))
+
+
+class LocalStorage:
+    """Files stay in the uploads folder; the app (or nginx) serves them"""
+
+    remote = False
+
+    def __init__(self, root):
+        self.root = root
+
+    def publish(self, key, path, immutable=False):
+        # The pipeline already wrote the file where it is served from
+        pass
+
+    def delete(self, key):
+        try:
+            os.unlink(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key):
+        return None
+
+
+class S3Storage:
+    """Files are uploaded to a bucket and served from it (or from a CDN in front of it)"""
+
+    remote = True
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, public_url=None):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self._client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def publish(self, key, path, immutable=False):
+        extra = {'ContentType': mimetypes.guess_type(key)[0] or 'application/octet-stream'}
+        if immutable:
+            extra['CacheControl'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        self._client.upload_file(path, self.bucket, self.prefix + key, ExtraArgs=extra)
+
+    def delete(self, key):
+        try:
+            self._client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not delete {key} from storage: {e}")
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url}/{self.prefix}{key}"
+        return self._client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.prefix + key}, ExpiresIn=PRESIGNED_URL_SECONDS
+        )
+
+
+def _make_storage():
+    from src.utils.images import UPLOAD_FOLDER
+    if STORAGE_BACKEND == 's3':
+        try:
+            return S3Storage(
+                os.environ['S3_BUCKET'],
+                prefix=os.environ.get('S3_PREFIX', 'uploads/'),
+                endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+                public_url=os.environ.get('STORAGE_PUBLIC_URL')
+            )
+        except (ImportError, KeyError) as e:
+            logger.warning(f"⚠️  STORAGE_BACKEND=s3 needs boto3 and S3_BUCKET ({e}), using local uploads folder")
+    return LocalStorage(UPLOAD_FOLDER)
+
+
+_storage = None
+
+
+def get_storage():
+    """The configured backend, created on first use (also inside image pool processes)"""
+    global _storage
+    if _storage is None:
+        _storage = _make_storage()
+    return _storage
@@ -0,0 +1,182 @@
+"""
+Streaming, resumable image uploads
+
+A client opens a session with the file's total size and extension, then
+PUTs the bytes in one or more chunks. Each chunk is copied from the request
+stream to uploads/incoming/<upload_id>.part in small blocks, so memory use
+doesn't grow with the file, and the size limit is enforced as bytes arrive.
+After a dropped connection the client asks for the session's offset and
+continues from there.
+
+Session state lives next to the data (<upload_id>.json) and the offset is
+the size of the .part file, so any worker can take the next chunk. The
+SHA-256 of the content is updated as chunks are written; a worker that
+didn't see the earlier chunks re-hashes the part file once to catch up.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+from src.utils.cache import TTLCache
+from src.utils.images import UPLOAD_FOLDER
+
+INCOMING_FOLDER = os.path.join(UPLOAD_FOLDER, 'incoming')
+BLOCK_SIZE = 64 * 1024
+# Abandoned sessions are deleted after this long
+SESSION_TTL_SECONDS = 24 * 3600
+
+# upload_id -> (offset, sha256 state) for sessions this process has written to
+_hashers = TTLCache(maxsize=256, ttl=SESSION_TTL_SECONDS)
+
+
+class UploadError(Exception):
+    """A chunk was rejected; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _paths(upload_id):
+    # ids are generated by us as hex; anything else can't name a session
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload not found', 404)
+    base = os.path.join(INCOMING_FOLDER, upload_id)
+    return base + '.json', base + '.part'
+
+
+def create_session(user_id, extension, size):
+    """Open an upload session, returns its state"""
+    os.makedirs(INCOMING_FOLDER, exist_ok=True)
+    expire_sessions()
+    upload_id = uuid.uuid4().hex
+    state = {'upload_id': upload_id, 'user_id': user_id, 'extension': extension, 'size': size, 'created_at': time.time()}
+    state_path, part_path = _paths(upload_id)
+    open(part_path, 'wb').close()
+    with open(state_path, 'w') as f:
+        json.dump(state, f)
+    return dict(state, offset=0)
+
+
+def get_session(upload_id, user_id):
+    """Session state including the current offset, or UploadError(404)"""
+    state_path, part_path = _paths(upload_id)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        state['offset'] = os.path.getsize(part_path)
+    except (OSError, ValueError):
+        raise UploadError('Upload not found', 404)
+    if state['user_id'] != user_id:
+        raise UploadError('Upload not found', 404)
+    return state
+
+
+def _hasher_at(upload_id, part, offset):
+    """SHA-256 state for the first offset bytes of the part file"""
+    cached = _hashers.get(upload_id)
+    if cached and cached[0] == offset:
+        return cached[1]
+    hasher = hashlib.sha256()
+    part.seek(0)
+    remaining = offset
+    while remaining:
+        block = part.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+        hasher.update(block)
+        remaining -= len(block)
+    return hasher
+
+
+def write_chunk(upload_id, user_id, offset, stream):
+    """
+    Append the bytes of stream at offset, which must equal the session's
+    current offset. Returns the updated state; 'sha256' is set once the
+    upload is complete.
+    """
+    state = get_session(upload_id, user_id)
+    _, part_path = _paths(upload_id)
+    if offset != state['offset']:
+        raise UploadError('Offset does not match the bytes received so far', 409, state['offset'])
+
+    with open(part_path, 'r+b') as part:
+        try:
+            # One writer per session; a parallel retry of the same chunk is told to resume
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk for this upload is in progress', 409, state['offset'])
+
+        current = os.fstat(part.fileno()).st_size
+        if current != offset:
+            raise UploadError('Offset does not match the bytes received so far', 409, current)
+        hasher = _hasher_at(upload_id, part, offset)
+        part.seek(offset)
+        try:
+            while True:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                if offset + len(block) > state['size']:
+                    raise UploadError('Upload is larger than its declared size', 413)
+                part.write(block)
+                hasher.update(block)
+                offset += len(block)
+        except UploadError:
+            # Oversized chunk: drop all of it so the client can resend from the chunk's start
+            part.truncate(state['offset'])
+            _hashers.delete(upload_id)
+            raise
+        except Exception:
+            # Dropped connection: keep what arrived, the client resumes from there
+            part.flush()
+            _hashers.set(upload_id, (offset, hasher))
+            raise
+        part.flush()
+
+    _hashers.set(upload_id, (offset, hasher))
+    state['offset'] = offset
+    if offset == state['size']:
+        state['sha256'] = hasher.hexdigest()
+    return state
+
+
+def finish_session(upload_id):
+    """Remove the session's state; returns the path of the received bytes for the caller to move"""
+    state_path, part_path = _paths(upload_id)
+    _hashers.delete(upload_id)
+    try:
+        os.unlink(state_path)
+    except FileNotFoundError:
+        pass
+    return part_path
+
+
+def discard_session(upload_id):
+    part_path = finish_session(upload_id)
+    try:
+        os.unlink(part_path)
+    except FileNotFoundError:
+        pass
+
+
+def expire_sessions(max_age=SESSION_TTL_SECONDS):
+    """Delete sessions that haven't received bytes for max_age seconds"""
+    if not os.path.isdir(INCOMING_FOLDER):
+        return 0
+    cutoff = time.time() - max_age
+    expired = 0
+    for name in os.listdir(INCOMING_FOLDER):
+        upload_id, extension = os.path.splitext(name)
+        if extension != '.part':
+            continue
+        try:
+            if os.path.getmtime(os.path.join(INCOMING_FOLDER, name)) < cutoff:
+                discard_session(upload_id)
+                expired += 1
+        except (OSError, UploadError):
+            continue
+    return expired
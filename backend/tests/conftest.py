@@ -0,0 +1,137 @@
+"""
+Shared fixtures: a Flask app on an in-memory SQLite database with the
+blueprints under test, and helpers to create users, listings and tokens.
+
+The app is assembled here instead of importing src.main, so tests don't run
+the startup migrations or start background workers.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level settings are read at import time
+os.environ.setdefault('EMAIL_BACKEND', 'stub')
+os.environ.setdefault('EMAIL_WORKER', 'off')
+os.environ.setdefault('IMAGE_WORKER', 'inline')
+os.environ.setdefault('UPLOAD_FOLDER', tempfile.mkdtemp(prefix='wildshare-uploads-'))
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from src.models.user import db, User
+from src.models.equipment import Equipment
+# Every model main.py registers, so relationships between them resolve
+from src.models.booking import Booking
+from src.models.payment import Payment
+from src.models.message import Message, Conversation
+from src.models.identity_verification import IdentityVerification
+from src.models.review import Review
+from src.models.earnings import OwnerDailyEarnings
+from src.models.outbox import OutboundEmail
+
+
+@pytest.fixture
+def app():
+    from src.routes.equipment import equipment_bp
+    from src.routes.bookings import bookings_bp
+    from src.routes.upload import upload_bp
+    from src.routes.availability import availability_bp
+    from src.routes.payments import payments_bp
+    from src.utils.response_cache import cache_backend
+
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        JWT_SECRET_KEY='test-secret-key-for-the-wild-share-suite',
+    )
+    JWTManager(app)
+    db.init_app(app)
+    app.register_blueprint(equipment_bp, url_prefix='/api')
+    app.register_blueprint(bookings_bp, url_prefix='/api')
+    app.register_blueprint(upload_bp, url_prefix='/api')
+    app.register_blueprint(availability_bp, url_prefix='/api')
+    app.register_blueprint(payments_bp, url_prefix='/api')
+
+    cache_backend.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    counter = {'n': 0}
+
+    def make(**fields):
+        counter['n'] += 1
+        defaults = dict(email=f"user{counter['n']}@example.com", password_hash='x', first_name='Test',
+                        last_name=f"User{counter['n']}", user_type='both', city='Denver', state='CO')
+        defaults.update(fields)
+        user = User(**defaults)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_equipment(app):
+    def make(owner, count=1, **fields):
+        items = []
+        for i in range(count):
+            defaults = dict(owner_id=owner.id, name=f"Tent {i}", description='Two person tent',
+                            category='camping', daily_price=10 + i)
+            defaults.update(fields)
+            items.append(Equipment(**defaults))
+        db.session.add_all(items)
+        db.session.commit()
+        return items
+    return make
+
+
+def auth_header(user):
+    return {'Authorization': f"Bearer {create_access_token(identity=str(user.id))}"}
+
+
+@pytest.fixture
+def make_booking(app):
+    def make(equipment, renter, start=None, days=2, status='pending'):
+        from datetime import date, timedelta
+        start = start or date(2030, 1, 1)
+        booking = Booking(equipment_id=equipment.id, renter_id=renter.id, start_date=start,
+                          end_date=start + timedelta(days=days), total_days=days, daily_rate=equipment.daily_price,
+                          total_cost=days * equipment.daily_price, deposit_amount=equipment.daily_price, status=status)
+        db.session.add(booking)
+        db.session.commit()
+        return booking
+    return make
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting every SQL statement executed inside it"""
+    import contextlib
+    from sqlalchemy import event
+
+    @contextlib.contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    return counting
@@ -0,0 +1,68 @@
+import threading
+from src.utils.autocomplete import AutocompleteIndex
+
+
+def test_stale_index_is_served_while_one_background_rebuild_runs(app, make_user, make_equipment, monkeypatch):
+    owner = make_user()
+    make_equipment(owner, name='Kayak paddle')
+    index = AutocompleteIndex(refresh_seconds=300)
+    assert [s['name'] for s in index.suggest('kay')] == ['Kayak paddle']
+
+    started, release, rebuilds = threading.Event(), threading.Event(), []
+    real_rebuild = index.rebuild
+
+    def slow_rebuild():
+        rebuilds.append(1)
+        started.set()
+        release.wait(5)
+        real_rebuild()
+    monkeypatch.setattr(index, 'rebuild', slow_rebuild)
+    index._built_at -= 301
+
+    assert [s['name'] for s in index.suggest('kay')] == ['Kayak paddle']
+    assert started.wait(5)
+    # Still stale and still rebuilding: answered from the old index, no second rebuild
+    assert [s['name'] for s in index.suggest('kay')] == ['Kayak paddle']
+    assert len(rebuilds) == 1
+
+    release.set()
+    with index._rebuild_lock:
+        pass
+    assert len(rebuilds) == 1
+
+
+def test_changes_during_a_rebuild_are_kept(app, make_user, make_equipment, monkeypatch):
+    owner = make_user()
+    kayak = make_equipment(owner, name='Kayak paddle')[0]
+    tent = make_equipment(owner, name='Tent stakes', is_available=False)[0]
+    index = AutocompleteIndex()
+    make_entry = index._make_entry
+
+    def listing_published_mid_rebuild(equipment, popularity):
+        # The tent goes live after the rebuild read the table, before it swaps in
+        if equipment.id == kayak.id and not tent.is_available:
+            tent.is_available = True
+            index.upsert(tent)
+        return make_entry(equipment, popularity)
+    monkeypatch.setattr(index, '_make_entry', listing_published_mid_rebuild)
+    index.rebuild()
+
+    assert [s['name'] for s in index.suggest('tent')] == ['Tent stakes']
+    assert [s['name'] for s in index.suggest('kay')] == ['Kayak paddle']
+
+
+def test_bookings_during_a_rebuild_are_not_counted_twice(app, make_user, make_equipment, make_booking, monkeypatch):
+    owner = make_user()
+    kayak = make_equipment(owner, name='Kayak paddle')[0]
+    index = AutocompleteIndex()
+    make_entry = index._make_entry
+
+    def booked_mid_rebuild(equipment, popularity):
+        # The booking was committed before the counts were read, then announced
+        index.record_booking(kayak.id)
+        return make_entry(equipment, popularity)
+    make_booking(kayak, make_user())
+    monkeypatch.setattr(index, '_make_entry', booked_mid_rebuild)
+    index.rebuild()
+
+    assert index._entries[kayak.id]['popularity'] == 1
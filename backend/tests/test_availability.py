@@ -0,0 +1,25 @@
+from datetime import date, timedelta
+from src.utils.availability import invalidate_blocked_dates
+
+
+def test_window_is_validated(client, make_user, make_equipment):
+    equipment = make_equipment(make_user())[0]
+    url = f"/api/equipment/{equipment.id}/blocked-dates"
+
+    assert client.get(url, query_string={'from': '2030-02-01', 'to': '2030-01-01'}).status_code == 400
+    assert client.get(url, query_string={'from': '2030-01-01', 'to': '2035-01-01'}).status_code == 400
+    assert client.get(url, query_string={'from': '2030-01-01', 'to': '2030-12-31'}).status_code == 200
+
+
+def test_etag_follows_the_returned_body(client, make_user, make_equipment, make_booking):
+    equipment = make_equipment(make_user())[0]
+    url = f"/api/equipment/{equipment.id}/blocked-dates"
+    first = client.get(url)
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    make_booking(equipment, make_user(), start=date.today() + timedelta(days=5), status='confirmed')
+    invalidate_blocked_dates(equipment.id)
+    changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert len(changed.get_json()['blocked_dates']) == 3
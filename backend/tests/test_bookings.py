@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.exc import IntegrityError
+from src.models.booking import is_overlap_violation
+
+
+def _integrity_error(constraint_name):
+    orig = Exception('violation')
+    orig.diag = SimpleNamespace(constraint_name=constraint_name)
+    return IntegrityError('INSERT INTO booking ...', {}, orig)
+
+
+@pytest.mark.parametrize('constraint_name, expected', [
+    ('booking_no_overlap', True),
+    ('booking_renter_id_fkey', False),
+    (None, False),
+])
+def test_only_the_overlap_constraint_counts_as_a_double_booking(constraint_name, expected):
+    assert is_overlap_violation(_integrity_error(constraint_name)) is expected
+
+
+def test_errors_without_diagnostics_are_not_overlaps():
+    # SQLite drivers carry no diag attribute
+    assert is_overlap_violation(IntegrityError('INSERT', {}, Exception('NOT NULL constraint failed'))) is False
@@ -0,0 +1,35 @@
+import pytest
+from src.models.user import db, User
+from src.models.message import Message
+from src.models.outbox import OutboundEmail
+from src.utils import email_notifications
+from src.utils.digests import send_due_digests
+
+
+def _hourly_user_with_unread(make_user, make_equipment):
+    owner = make_user()
+    equipment = make_equipment(owner)[0]
+    receiver = make_user(message_notification_mode='hourly')
+    db.session.add(Message(equipment_id=equipment.id, sender_id=owner.id, receiver_id=receiver.id, message='Still free?'))
+    db.session.commit()
+    return receiver.id
+
+
+def test_failed_queueing_leaves_the_digest_due(app, make_user, make_equipment, monkeypatch):
+    receiver_id = _hourly_user_with_unread(make_user, make_equipment)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('template error')
+    monkeypatch.setattr(email_notifications, 'send_message_digest_email', broken)
+    with pytest.raises(RuntimeError):
+        send_due_digests('hourly')
+
+    assert db.session.get(User, receiver_id).last_message_digest_at is None
+    assert OutboundEmail.query.count() == 0
+
+    monkeypatch.undo()
+    assert send_due_digests('hourly') == (1, 1)
+    assert db.session.get(User, receiver_id).last_message_digest_at is not None
+    assert OutboundEmail.query.count() == 1
+    # Claimed: nothing is due until the next window
+    assert send_due_digests('hourly') == (0, 0)
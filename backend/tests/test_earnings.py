@@ -0,0 +1,108 @@
+from src.models.user import db
+from src.models.booking import Booking
+from src.models.earnings import OwnerDailyEarnings
+from src.utils.earnings import complete_booking, rollup_out_of_sync, rebuild_owner_earnings
+from conftest import auth_header
+
+
+def _totals():
+    rows = OwnerDailyEarnings.query.all()
+    return sum(row.bookings for row in rows), round(sum(row.gross for row in rows), 2)
+
+
+def _active_booking(make_user, make_equipment, make_booking):
+    owner = make_user()
+    equipment = make_equipment(owner, daily_price=20)[0]
+    booking = make_booking(equipment, make_user(user_type='renter'), status='active')
+    return owner, booking
+
+
+def test_completing_twice_counts_once(client, make_user, make_equipment, make_booking):
+    owner, booking = _active_booking(make_user, make_equipment, make_booking)
+    url = f"/api/bookings/{booking.id}/status"
+
+    assert client.put(url, json={'status': 'completed'}, headers=auth_header(owner)).status_code == 200
+    assert client.put(url, json={'status': 'completed'}, headers=auth_header(owner)).status_code == 400
+    assert _totals() == (1, 40.0)
+
+
+def test_concurrent_claims_only_one_wins(app, make_user, make_equipment, make_booking):
+    _, booking = _active_booking(make_user, make_equipment, make_booking)
+    # Both requests read the booking while it was still active
+    stale = Booking.query.get(booking.id)
+
+    assert complete_booking(booking) is True
+    assert complete_booking(stale) is False
+    db.session.commit()
+    assert _totals() == (1, 40.0)
+
+
+def test_reverting_or_deleting_a_completed_booking_subtracts_it(app, make_user, make_equipment, make_booking):
+    _, booking = _active_booking(make_user, make_equipment, make_booking)
+    complete_booking(booking)
+    db.session.commit()
+    assert _totals() == (1, 40.0)
+
+    booking.status = 'active'
+    db.session.commit()
+    assert _totals() == (0, 0.0)
+    assert OwnerDailyEarnings.query.count() == 0
+
+    booking.status = 'completed'
+    db.session.commit()
+    assert _totals() == (1, 40.0)
+
+    db.session.delete(booking)
+    db.session.commit()
+    assert _totals() == (0, 0.0)
+    assert not rollup_out_of_sync()
+
+
+def test_drift_is_detected_and_rebuilt(app, make_user, make_equipment, make_booking):
+    _, booking = _active_booking(make_user, make_equipment, make_booking)
+    complete_booking(booking)
+    db.session.commit()
+
+    # A bulk update bypasses the session hook
+    Booking.query.filter_by(id=booking.id).update({'total_cost': 100.0})
+    db.session.commit()
+    assert rollup_out_of_sync()
+
+    rebuild_owner_earnings()
+    assert not rollup_out_of_sync()
+    assert _totals() == (1, 100.0)
+
+
+def test_confirm_return_retry_reuses_the_stripe_refund(client, make_user, make_equipment, make_booking, monkeypatch):
+    import stripe
+    from types import SimpleNamespace
+    from src.models.payment import Payment
+
+    owner, booking = _active_booking(make_user, make_equipment, make_booking)
+    owner.stripe_account_id = 'acct_owner'
+    db.session.add(Payment(booking_id=booking.id, payment_type='deposit', amount=20, stripe_payment_id='pi_1', status='completed'))
+    db.session.commit()
+
+    refund_keys, transfer_keys = [], []
+
+    def refund(**kwargs):
+        refund_keys.append(kwargs['idempotency_key'])
+        return SimpleNamespace(id='re_1')
+
+    def failing_transfer(**kwargs):
+        transfer_keys.append(kwargs['idempotency_key'])
+        raise stripe.error.APIConnectionError('network down')
+    monkeypatch.setattr(stripe.Refund, 'create', refund)
+    monkeypatch.setattr(stripe.Transfer, 'create', failing_transfer)
+
+    body = {'booking_id': booking.id}
+    assert client.post('/api/confirm-return', json=body, headers=auth_header(owner)).status_code == 500
+    assert _totals() == (0, 0.0)
+
+    monkeypatch.setattr(stripe.Transfer, 'create', lambda **kwargs: transfer_keys.append(kwargs['idempotency_key']) or SimpleNamespace(id='tr_1'))
+    assert client.post('/api/confirm-return', json=body, headers=auth_header(owner)).status_code == 200
+
+    # Stripe answers the retried refund with the original one instead of refunding again
+    assert refund_keys == [f"booking-{booking.id}-refund"] * 2
+    assert transfer_keys == [f"booking-{booking.id}-transfer"] * 2
+    assert _totals() == (1, 40.0)
@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+from src.models.user import db
+from src.models.outbox import OutboundEmail
+from src.utils.email_outbox import enqueue_email
+from conftest import auth_header
+
+
+def test_enqueue_is_part_of_the_callers_transaction(app):
+    enqueue_email('renter@example.com', 'Hello', '<p>Hello</p>')
+    db.session.rollback()
+    assert OutboundEmail.query.count() == 0
+
+    enqueue_email('renter@example.com', 'Hello', '<p>Hello</p>')
+    db.session.commit()
+    assert OutboundEmail.query.count() == 1
+
+
+def test_booking_emails_are_committed_with_the_booking(client, make_user, make_equipment):
+    owner = make_user()
+    equipment = make_equipment(owner)[0]
+    renter = make_user(user_type='renter')
+    start = date.today() + timedelta(days=3)
+
+    response = client.post('/api/bookings', json={
+        'equipment_id': equipment.id,
+        'start_date': start.isoformat(),
+        'end_date': (start + timedelta(days=2)).isoformat()
+    }, headers=auth_header(renter))
+
+    assert response.status_code == 201
+    assert sorted(email.to_email for email in OutboundEmail.query.all()) == sorted([owner.email, renter.email])
@@ -0,0 +1,35 @@
+import pytest
+from werkzeug.exceptions import NotFound
+from src.utils import file_serving
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('index-BeK0CnoU.js', True),
+    ('index-CoWaKVsJ.css', True),
+    ('vendor-a1_b2-c3.css', True),
+    ('logo-whitebackground.png', False),
+    ('site-manifest.json', False),
+    ('logo-original.png', False),
+    ('camping-overview.jpg', False),
+    ('hero-image.jpg', False),
+    ('index-BeK0Cn.js', False),
+])
+def test_fingerprinted_names_need_a_real_8_character_hash(tmp_path, name, expected):
+    assert file_serving.is_fingerprinted(name, None, str(tmp_path)) is expected
+
+
+def test_x_accel_leaves_immutable_cache_headers_to_nginx(app, tmp_path, monkeypatch):
+    (tmp_path / 'index-BeK0CnoU.js').write_text('console.log(1)')
+    (tmp_path / 'robots.txt').write_text('')
+    monkeypatch.setattr(file_serving, 'FILE_OFFLOAD', 'x-accel')
+
+    with app.test_request_context():
+        immutable = file_serving.serve_file(str(tmp_path), 'index-BeK0CnoU.js', '/internal/assets/', immutable=True)
+        assert immutable.headers['X-Accel-Redirect'] == '/internal/assets/index-BeK0CnoU.js'
+        assert 'Cache-Control' not in immutable.headers
+
+        revalidated = file_serving.serve_file(str(tmp_path), 'robots.txt', '/internal/assets/')
+        assert revalidated.cache_control.no_cache
+
+        with pytest.raises(NotFound):
+            file_serving.serve_file(str(tmp_path), 'missing.js', '/internal/assets/', immutable=True)
@@ -0,0 +1,29 @@
+from src.models.user import db
+from src.models.equipment import Equipment
+from src.utils import geo
+
+
+def test_backfill_only_tries_each_listing_once(app, make_user, make_equipment, monkeypatch):
+    located = make_equipment(make_user(), location='Boulder, CO')[0]
+    unknown = make_equipment(make_user(city='Tinyville', state='ZZ'), location='Tinyville, ZZ')[0]
+
+    assert geo.backfill_equipment_coordinates() == 1
+    assert db.session.get(Equipment, located.id).latitude is not None
+    assert db.session.get(Equipment, unknown.id).geocoded_at is not None
+
+    attempts = []
+    monkeypatch.setattr(geo, 'geocode', lambda **kwargs: attempts.append(kwargs))
+    geo.backfill_equipment_coordinates()
+    assert attempts == []
+
+    geo.backfill_equipment_coordinates(retry=True)
+    assert len(attempts) == 1
+
+
+def test_online_fallback_places_listings_the_gazetteer_misses(app, make_user, make_equipment, monkeypatch):
+    equipment = make_equipment(make_user(city='Tinyville', state='ZZ'), location='Tinyville, ZZ 80999')[0]
+    monkeypatch.setattr(geo, 'geocode_online', lambda query: (40.0, -105.0) if query else None)
+
+    # Request handlers stay offline; only geocode_listings.py goes online
+    assert geo.geocode_equipment(equipment) is None
+    assert geo.geocode_equipment(equipment, online=True) == (40.0, -105.0)
@@ -0,0 +1,64 @@
+import json
+import os
+import time
+from src.models.user import db
+from src.utils.images import UPLOAD_FOLDER, VARIANT_FOLDER, VARIANTS, variant_path
+from src.utils.image_gc import reference_stem, reference_counts, collect_garbage
+
+OLD = time.time() - 3 * 24 * 3600
+
+
+def _upload(stem, age=OLD, variants=True):
+    path = os.path.join(UPLOAD_FOLDER, f"{stem}.jpg")
+    with open(path, 'wb') as f:
+        f.write(b'jpeg')
+    os.utime(path, (age, age))
+    if variants:
+        # Same layout process_image writes: variants/<stem>/<name>.webp for each size
+        for name, _ in VARIANTS:
+            os.makedirs(os.path.dirname(variant_path(stem, name)), exist_ok=True)
+            with open(variant_path(stem, name), 'wb') as f:
+                f.write(b'webp')
+    return path
+
+
+def test_reference_stem_understands_originals_and_variants():
+    assert reference_stem('/uploads/abc.jpg') == 'abc'
+    assert reference_stem('https://example.com/api/uploads/abc.jpg?v=2') == 'abc'
+    assert reference_stem('/uploads/variants/abc/card.webp') == 'abc'
+    assert reference_stem('https://cdn.example.com/photo.jpg') is None
+    assert reference_stem(None) is None
+
+
+def test_counts_every_listing_and_profile_reference(app, make_user, make_equipment):
+    owner = make_user(profile_image_url='/uploads/shared.jpg')
+    make_equipment(owner, image_url='/uploads/shared.jpg',
+                   image_urls=json.dumps(['/uploads/shared.jpg', '/uploads/variants/gallery/full.webp']))
+    make_equipment(owner, image_url='/uploads/gallery.jpg')
+
+    counts = reference_counts()
+    # A listing using the same image as cover and in its gallery counts once
+    assert counts['shared'] == 2
+    assert counts['gallery'] == 2
+
+
+def test_collects_only_old_unreferenced_uploads(app, make_user, make_equipment):
+    make_equipment(make_user(), image_url='/uploads/kept.jpg')
+    kept = _upload('kept')
+    orphan = _upload('orphan')
+    fresh = _upload('fresh', age=time.time(), variants=False)
+
+    removed = collect_garbage()
+
+    assert os.path.exists(kept)
+    assert all(os.path.exists(variant_path('kept', name)) for name, _ in VARIANTS)
+    assert not os.path.exists(orphan) and not os.path.exists(os.path.join(VARIANT_FOLDER, 'orphan'))
+    assert os.path.exists(fresh)
+    assert removed['originals'] >= 1 and removed['variant_folders'] >= 1
+
+    # Once the listing drops it, the image goes too
+    from src.models.equipment import Equipment
+    Equipment.query.update({'image_url': None})
+    db.session.commit()
+    collect_garbage()
+    assert not os.path.exists(kept)
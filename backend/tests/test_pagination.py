@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from src.models.user import db
+from src.utils.pagination import encode_cursor, decode_cursor, encode_offset_cursor, decode_offset_cursor, InvalidCursor
+import pytest
+
+
+def test_cursor_round_trip_keeps_types():
+    created = datetime(2026, 5, 1, 12, 30)
+    token = encode_cursor('newest', [created, 42])
+    assert decode_cursor('newest', token, 2) == [created, 42]
+
+
+def test_cursor_rejects_other_sort_and_shape():
+    token = encode_cursor('newest', [datetime(2026, 5, 1), 42])
+    with pytest.raises(InvalidCursor):
+        decode_cursor('oldest', token)
+    with pytest.raises(InvalidCursor):
+        decode_cursor('newest', token, 3)
+    with pytest.raises(InvalidCursor):
+        decode_cursor('newest', 'not-a-cursor')
+
+
+def test_offset_and_keyset_cursors_are_not_interchangeable():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('newest', encode_offset_cursor('newest', 50))
+    with pytest.raises(InvalidCursor):
+        decode_offset_cursor('newest', encode_cursor('newest', [datetime(2026, 5, 1), 1]))
+    assert decode_offset_cursor('relevance', encode_offset_cursor('relevance', 50)) == 50
+
+
+def _page_ids(client, **params):
+    response = client.get('/api/equipment', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return [item['id'] for item in body['equipment']], body['next_cursor']
+
+
+def test_listing_cursor_walks_every_item_once(client, make_user, make_equipment):
+    owner = make_user()
+    items = make_equipment(owner, count=7)
+    base = datetime(2026, 1, 1)
+    for i, item in enumerate(items):
+        # Ties on created_at must still page by id
+        item.created_at = base + timedelta(days=i // 2)
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 3}
+        if cursor:
+            params['cursor'] = cursor
+        ids, cursor = _page_ids(client, **params)
+        seen += ids
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(item.id for item in items)
+    assert len(seen) == len(set(seen))
+
+
+def test_offset_page_continues_with_keyset_cursor(client, make_user, make_equipment):
+    owner = make_user()
+    make_equipment(owner, count=6)
+
+    all_ids, _ = _page_ids(client, limit=6, sort_by='price_asc')
+    ids, cursor = _page_ids(client, limit=2, offset=2, sort_by='price_asc')
+    assert ids == all_ids[2:4]
+    next_ids, _ = _page_ids(client, limit=2, cursor=cursor, sort_by='price_asc')
+    assert next_ids == all_ids[4:6]
+
+
+def test_listing_rejects_bad_cursors(client, make_user, make_equipment):
+    owner = make_user()
+    make_equipment(owner, count=3)
+    cursor = encode_cursor('newest', [datetime(2026, 1, 1), 1])
+
+    assert client.get('/api/equipment', query_string={'cursor': cursor, 'offset': 2}).status_code == 400
+    assert client.get('/api/equipment', query_string={'cursor': encode_offset_cursor('newest', 3)}).status_code == 400
+    assert client.get('/api/equipment', query_string={'cursor': cursor, 'sort_by': 'oldest'}).status_code == 400
@@ -0,0 +1,48 @@
+"""Listing pages must run the same number of SQL statements whatever their size"""
+from datetime import date, timedelta
+from src.models.user import db
+from conftest import auth_header
+
+
+def _equipment_page_statements(client, count_queries):
+    db.session.expunge_all()
+    with count_queries() as statements:
+        response = client.get('/api/equipment', query_string={'limit': 50})
+    assert response.status_code == 200
+    return len(statements), len(response.get_json()['equipment'])
+
+
+def test_equipment_list_statement_count_is_constant(client, make_user, make_equipment, count_queries):
+    make_equipment(make_user())
+    one, returned = _equipment_page_statements(client, count_queries)
+    assert returned == 1
+
+    for _ in range(9):
+        make_equipment(make_user(), count=2)
+    many, returned = _equipment_page_statements(client, count_queries)
+    assert returned == 19
+    assert many == one
+
+
+def _bookings_page_statements(client, renter, count_queries):
+    headers = auth_header(renter)
+    db.session.expunge_all()
+    with count_queries() as statements:
+        response = client.get('/api/my-bookings', query_string={'limit': 50}, headers=headers)
+    assert response.status_code == 200
+    return len(statements), len(response.get_json())
+
+
+def test_bookings_list_statement_count_is_constant(client, make_user, make_equipment, make_booking, count_queries):
+    renter = make_user(user_type='renter')
+    make_booking(make_equipment(make_user())[0], renter)
+    one, returned = _bookings_page_statements(client, renter, count_queries)
+    assert returned == 1
+
+    start = date(2031, 1, 1)
+    for i in range(8):
+        equipment = make_equipment(make_user())[0]
+        make_booking(equipment, renter, start=start + timedelta(days=10 * i))
+    many, returned = _bookings_page_statements(client, renter, count_queries)
+    assert returned == 9
+    assert many == one
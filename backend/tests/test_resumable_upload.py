@@ -0,0 +1,55 @@
+import hashlib
+import io
+from PIL import Image
+from conftest import auth_header
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (200, 80, 20)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _open(client, headers, size):
+    response = client.post('/api/upload/sessions', json={'size': size, 'extension': 'png'}, headers=headers)
+    assert response.status_code == 201
+    return f"/api/upload/sessions/{response.get_json()['upload_id']}"
+
+
+def test_chunks_resume_from_the_server_offset(client, make_user):
+    headers = auth_header(make_user())
+    data = _png()
+    half = len(data) // 2
+    url = _open(client, headers, len(data))
+
+    first = client.put(url, data=data[:half], headers=dict(headers, **{'Upload-Offset': '0'}))
+    assert first.status_code == 200
+    assert first.get_json()['offset'] == half
+
+    # A retried first chunk is told where to resume instead of being appended twice
+    stale = client.put(url, data=data[:half], headers=dict(headers, **{'Upload-Offset': '0'}))
+    assert stale.status_code == 409
+    assert stale.get_json()['offset'] == half
+
+    resume = client.get(url, headers=headers)
+    assert resume.headers['Upload-Offset'] == str(half)
+
+    done = client.put(url, data=data[half:], headers=dict(headers, **{'Upload-Offset': str(half)}))
+    assert done.status_code == 201
+    body = done.get_json()
+    assert body['sha256'] == hashlib.sha256(data).hexdigest()
+    assert body['image_url'].startswith(f"/uploads/{body['sha256']}")
+
+
+def test_oversized_chunk_is_dropped_whole(client, make_user):
+    headers = auth_header(make_user())
+    url = _open(client, headers, 10)
+
+    assert client.put(url, data=b'x' * 4, headers=dict(headers, **{'Upload-Offset': '0'})).status_code == 200
+    assert client.put(url, data=b'x' * 20, headers=dict(headers, **{'Upload-Offset': '4'})).status_code == 413
+    assert client.get(url, headers=headers).get_json()['offset'] == 4
+
+
+def test_sessions_belong_to_their_user(client, make_user):
+    url = _open(client, auth_header(make_user()), 10)
+    assert client.get(url, headers=auth_header(make_user())).status_code == 404
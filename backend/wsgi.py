@@ -11,6 +11,11 @@ sys.path.insert(0, current_dir)
 
 # Now import the app from src.main
 from src.main import app
+from src.utils.email_outbox import start_email_worker
+
+# Only the web server delivers queued emails in the background; scripts that
+# import src.main don't (EMAIL_WORKER=cli when send_emails.py runs instead)
+start_email_worker(app)
 
 if __name__ == "__main__":
     app.run()